@@ -1,5 +1,11 @@
 from django.apps import AppConfig
-from django.db.models.signals import pre_save, post_save, post_delete
+from django.db.models.signals import (
+    pre_save,
+    pre_delete,
+    post_save,
+    post_delete,
+    m2m_changed
+)
 
 
 class BlogConfig(AppConfig):
@@ -7,16 +13,48 @@ class BlogConfig(AppConfig):
     name = 'blog'
 
     def ready(self):
-        from core.models import Post
-        from core.models import Message
+        from blog import jobs  # noqa: F401 registers job handlers
+        from core.models import Post, Portfolio
+        from core.models import Category, Message, Photos, Tag
         from blog.signals import (
             pre_save_post_reciever,
+            pre_save_post_render_reciever,
             blog_post_delete_handler,
             blog_post_save_handler,
+            blog_post_m2m_handler,
+            post_search_vector_handler,
+            post_tags_delete_handler,
+            image_variants_handler,
+            photos_change_handler,
+            response_cache_handler,
+            RESPONSE_CACHE_TAGS,
+            taxonomy_count_delete_handler,
+            taxonomy_count_m2m_handler,
+            taxonomy_delete_handler,
+            taxonomy_save_handler,
             post_save_message_reciever
         )
 
-        post_save.connect(blog_post_save_handler, sender=Post)
-        post_delete.connect(blog_post_delete_handler, sender=Post)
-        pre_save.connect(pre_save_post_reciever, sender=Post)
+        for model in (Post, Portfolio):
+            pre_save.connect(pre_save_post_reciever, sender=model)
+            pre_save.connect(pre_save_post_render_reciever, sender=model)
+            post_save.connect(blog_post_save_handler, sender=model)
+            post_save.connect(post_search_vector_handler, sender=model)
+            post_save.connect(image_variants_handler, sender=model)
+            post_delete.connect(blog_post_delete_handler, sender=model)
+        # Deleting a portfolio deletes its parent post, count it once
+        pre_delete.connect(taxonomy_count_delete_handler, sender=Post)
+        pre_delete.connect(post_tags_delete_handler, sender=Post)
+        for through in (Post.tags.through, Post.category.through):
+            m2m_changed.connect(blog_post_m2m_handler, sender=through)
+            m2m_changed.connect(taxonomy_count_m2m_handler, sender=through)
+        for model in (Tag, Category):
+            post_save.connect(taxonomy_save_handler, sender=model)
+            pre_delete.connect(taxonomy_delete_handler, sender=model)
+        for model in RESPONSE_CACHE_TAGS:
+            post_save.connect(response_cache_handler, sender=model)
+            post_delete.connect(response_cache_handler, sender=model)
         post_save.connect(post_save_message_reciever, sender=Message)
+        post_save.connect(photos_change_handler, sender=Photos)
+        post_save.connect(image_variants_handler, sender=Photos)
+        post_delete.connect(photos_change_handler, sender=Photos)
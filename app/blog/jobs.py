@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.jobs import job
+from core.models import Message, Post
+from core.utils import bump_post_cache_version, delete_image_variants, \
+    generate_image_variants, invalidate_response_cache
+
+
+@job('send_message_email')
+def send_message_email(message_id):
+    """
+    Deliver the confirmation email of a contact form message
+    """
+    message = Message.objects.get(pk=message_id)
+    send = import_string(settings.MESSAGE_EMAIL_SENDER)
+    send(message)
+
+
+@job('generate_image_variants')
+def generate_image_variants_job(model, pk):
+    """
+    Generate the resized copies of an uploaded post or photo image
+    """
+    Model = apps.get_model(model)
+    instance = Model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return
+    if instance.image_variants.get('source') == instance.image.name:
+        return
+
+    variants = generate_image_variants(instance.image)
+    delete_image_variants(instance.image_variants)
+
+    # Write with update() so the post_save receiver does not queue again
+    if isinstance(instance, Post):
+        now = timezone.now()
+        Post.objects.filter(pk=pk).update(
+            image_variants=variants, cache_version=now)
+        bump_post_cache_version(instance.slug, now)
+        invalidate_response_cache('posts')
+    else:
+        Model.objects.filter(pk=pk).update(image_variants=variants)
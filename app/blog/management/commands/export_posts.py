@@ -0,0 +1,74 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from core.models import Category, Post, Tag
+
+
+POST_FIELDS = (
+    'title', 'description', 'slug', 'featured', 'content', 'image',
+)
+
+
+def export_post(post):
+    """
+    Return the NDJSON record of a post
+    """
+    record = {field: getattr(post, field) for field in POST_FIELDS}
+    record['image'] = post.image.name or None
+    record['author'] = post.author.email
+    record['date_posted'] = post.date_posted.isoformat()
+    record['tags'] = [tag.name for tag in post.tags.all()]
+    record['category'] = [category.name for category in post.category.all()]
+    return record
+
+
+class Command(BaseCommand):
+    """Django command to export blog posts as NDJSON"""
+    help = 'Write blog posts with their tags and categories as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='File to write to, standard output by default')
+        parser.add_argument(
+            '--batch', type=int, default=500,
+            help='Number of posts read per query')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        # Portfolios need their own table and are not exported as posts
+        queryset = Post.objects.filter(portfolio__isnull=True).select_related(
+            'author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+            Prefetch('category', queryset=Category.objects.only('id', 'name')),
+        ).order_by('id')
+
+        to_stdout = options['output'] == '-'
+        output = self.stdout if to_stdout else open(
+            options['output'], 'w', encoding='utf-8')
+        start = time.perf_counter()
+        count = 0
+        last_id = 0
+        try:
+            while True:
+                # Keyset pages keep memory flat and still allow prefetching
+                posts = list(
+                    queryset.filter(id__gt=last_id)[:options['batch']])
+                if not posts:
+                    break
+                for post in posts:
+                    output.write(json.dumps(export_post(post)) + '\n')
+                count += len(posts)
+                last_id = posts[-1].id
+        finally:
+            if not to_stdout:
+                output.close()
+
+        elapsed = time.perf_counter() - start
+        report = self.stderr if to_stdout else self.stdout
+        report.write(self.style.SUCCESS(
+            f'Exported {count} posts in {elapsed:.2f}s '
+            f'({count / elapsed if elapsed else 0:.0f} rows/s)'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import enqueue
+from core.models import Photos, Post
+
+from blog.jobs import generate_image_variants_job
+
+
+class Command(BaseCommand):
+    """Django command to generate resized copies of uploaded images"""
+    help = 'Generate WebP variants for post and photo images missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='store_true',
+            help='Queue the work for the job worker instead of running it')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        count = 0
+        for model in (Post, Photos):
+            queryset = model.objects.exclude(image='').exclude(
+                image__isnull=True).only('id', 'image', 'image_variants')
+            for instance in queryset.iterator():
+                if instance.image_variants.get('source') == \
+                        instance.image.name:
+                    continue
+                label = model._meta.label_lower
+                if options['queue']:
+                    enqueue('generate_image_variants',
+                            model=label, pk=instance.pk)
+                else:
+                    generate_image_variants_job(label, instance.pk)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Queued" if options["queue"] else "Generated"} variants '
+            f'for {count} images'))
@@ -0,0 +1,196 @@
+import itertools
+import json
+import sys
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from core.models import Category, Post, Tag, TaxonomyCount
+from core.utils import bulk_create_with_unique_slugs, \
+    invalidate_response_cache, render_post
+
+from blog.management.commands.export_posts import POST_FIELDS
+from blog.search import update_search_vectors
+
+
+def read_records(stream):
+    """
+    Yield the line number and decoded record of every NDJSON line
+    """
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Line {number}: {error}')
+
+
+class Command(BaseCommand):
+    """Django command to import blog posts from NDJSON"""
+    help = 'Create blog posts with their tags and categories from NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='File to read from, standard input by default')
+        parser.add_argument(
+            '--batch', type=int, default=500,
+            help='Number of posts written per transaction')
+        parser.add_argument(
+            '--author',
+            help='Email of the author of records without one')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        self.authors = {}
+        self.taxonomy = {Tag: {}, Category: {}}
+        self.default_author = None
+        if options['author']:
+            self.default_author = self.resolve_authors(
+                {options['author']})[options['author']]
+
+        stream = sys.stdin if options['input'] == '-' else open(
+            options['input'], encoding='utf-8')
+        start = time.perf_counter()
+        count = 0
+        try:
+            records = read_records(stream)
+            while True:
+                batch = list(itertools.islice(records, options['batch']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    self.import_batch(batch)
+                count += len(batch)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        # Bulk writes send no signals, drop the cached responses at once
+        invalidate_response_cache('posts', 'tags', 'categories')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {count} posts in {elapsed:.2f}s '
+            f'({count / elapsed if elapsed else 0:.0f} rows/s)'))
+
+    def resolve_authors(self, emails):
+        """
+        Return the user id of every email, reading unknown ones at once
+        """
+        missing = emails - self.authors.keys()
+        if missing:
+            self.authors.update(get_user_model().objects.filter(
+                email__in=missing).values_list('email', 'id'))
+        unknown = emails - self.authors.keys()
+        if unknown:
+            raise CommandError(
+                f'Unknown authors: {", ".join(sorted(unknown))}')
+        return self.authors
+
+    def resolve_names(self, model, owners):
+        """
+        Return the id of every tag or category name, reading unknown names
+        at once and creating the ones that do not exist yet
+        """
+        ids = self.taxonomy[model]
+        missing = owners.keys() - ids.keys()
+        if missing:
+            # Names are not unique, the oldest match wins
+            existing = model.objects.filter(
+                name__in=missing).order_by('-id').values_list('id', 'name')
+            for pk, name in existing:
+                ids[name] = pk
+            created = missing - ids.keys()
+            if created:
+                model.objects.bulk_create(
+                    [model(name=name, user_id=owners[name])
+                     for name in created])
+                ids.update(model.objects.filter(
+                    name__in=created).values_list('name', 'id'))
+        return ids
+
+    def import_batch(self, batch):
+        """
+        Write one batch of records with a fixed number of queries
+        """
+        emails = set()
+        for number, record in batch:
+            if not record.get('title'):
+                raise CommandError(f'Line {number}: a title is required')
+            if record.get('author'):
+                emails.add(record['author'])
+            elif self.default_author is None:
+                raise CommandError(
+                    f'Line {number}: no author, pass --author')
+            for key in ('tags', 'category'):
+                names = record.get(key) or []
+                # A single name is accepted, not taken as its characters
+                if isinstance(names, str):
+                    names = [names]
+                if not isinstance(names, list) or not all(
+                        isinstance(name, str) for name in names):
+                    raise CommandError(
+                        f'Line {number}: {key} must be a list of names')
+                record[key] = names
+        authors = self.resolve_authors(emails)
+
+        posts = []
+        owners = {Tag: {}, Category: {}}
+        for number, record in batch:
+            author_id = authors.get(record.get('author'), self.default_author)
+            post = Post(author_id=author_id, **{
+                field: record[field] for field in POST_FIELDS
+                if record.get(field) is not None and field != 'slug'
+            })
+            # Exported slugs are kept unless taken, then get a suffix
+            post._slug_source = record.get('slug') or post.title
+            posts.append(render_post(post))
+            for model, key in ((Tag, 'tags'), (Category, 'category')):
+                for name in record.get(key) or ():
+                    owners[model].setdefault(name, author_id)
+
+        tag_ids = self.resolve_names(Tag, owners[Tag])
+        category_ids = self.resolve_names(Category, owners[Category])
+
+        bulk_create_with_unique_slugs(Post, posts, title_field='_slug_source')
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(Post.objects.filter(
+                slug__in=[post.slug for post in posts]
+            ).values_list('slug', 'id'))
+            for post in posts:
+                post.id = post.pk = ids[post.slug]
+
+        dated = []
+        tag_links = []
+        category_links = []
+        for post, (number, record) in zip(posts, batch):
+            if record.get('date_posted'):
+                post.date_posted = parse_datetime(record['date_posted'])
+                dated.append(post)
+            tag_links.extend(
+                Post.tags.through(post_id=post.id, tag_id=tag_ids[name])
+                for name in set(record.get('tags') or ()))
+            category_links.extend(
+                Post.category.through(
+                    post_id=post.id, category_id=category_ids[name])
+                for name in set(record.get('category') or ()))
+
+        # date_posted is set on insert, keep the exported dates instead
+        if dated:
+            Post.objects.bulk_update(dated, ['date_posted'])
+        Post.tags.through.objects.bulk_create(tag_links)
+        Post.category.through.objects.bulk_create(category_links)
+        # Bulk inserts send no m2m_changed, count the new links here
+        for field, links in (('tag', tag_links),
+                             ('category', category_links)):
+            counts = Counter(getattr(link, f'{field}_id') for link in links)
+            TaxonomyCount.objects.adjust(
+                field, {pk: (count, 0) for pk, count in counts.items()})
+        update_search_vectors(
+            Post.objects.filter(id__in=[post.id for post in posts]))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import TaxonomyCount
+from core.utils import invalidate_response_cache
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the tag and category counters"""
+    help = 'Recount the posts and portfolios of every tag and category'
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        with transaction.atomic():
+            count = TaxonomyCount.objects.recount()
+        invalidate_response_cache('tags', 'categories')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {count} tags and categories'))
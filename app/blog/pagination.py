@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PostCursorPagination(BasePagination):
+    """
+    Keyset pagination over posts ordered by (date_posted, id)
+    Pages are found with an indexed range filter from the cursor position
+    instead of a COUNT and OFFSET, so deep pages cost the same as the first
+    and rows inserted meanwhile never shift the page boundaries
+    """
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_param = StandardResultsSetPagination.page_size_query_param
+    max_page_size = StandardResultsSetPagination.max_page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        if reverse:
+            ordering = ('date_posted', 'pk')
+        else:
+            ordering = ('-date_posted', '-pk')
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            date_posted, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(date_posted__gt=date_posted) |
+                    Q(date_posted=date_posted, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(date_posted__lt=date_posted) |
+                    Q(date_posted=date_posted, pk__lt=pk)
+                )
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        self.page = results[:page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        """
+        Return the ((date_posted, pk), reverse) position of the cursor
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            date_posted = parse_datetime(data['d'])
+            pk = int(data['i'])
+            reverse = bool(data.get('r'))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if date_posted is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return (date_posted, pk), reverse
+
+    def encode_cursor(self, obj, reverse):
+        data = {'d': obj.date_posted.isoformat(), 'i': obj.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode())
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode()
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
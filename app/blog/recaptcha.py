@@ -0,0 +1,45 @@
+from django.conf import settings
+
+
+RECAPTCHA_VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
+
+
+def recaptcha_payload(token):
+    return {'secret': settings.RECAPTCHA_KEY, 'response': token}
+
+
+def verify_recaptcha(token):
+    """
+    Return whether reCAPTCHA accepts the token
+    Network errors and bad answers count as a failed check
+    """
+    # Only message submission needs an HTTP client, load it on first use
+    import requests
+
+    try:
+        res = requests.post(
+            RECAPTCHA_VERIFY_URL,
+            data=recaptcha_payload(token),
+            timeout=settings.RECAPTCHA_TIMEOUT
+        )
+        result = res.json()
+    except (requests.RequestException, ValueError):
+        return False
+    return bool(result.get('success'))
+
+
+async def averify_recaptcha(token):
+    """
+    Same as verify_recaptcha without holding a thread while Google answers
+    """
+    import httpx
+
+    try:
+        async with httpx.AsyncClient(
+                timeout=settings.RECAPTCHA_TIMEOUT) as client:
+            res = await client.post(
+                RECAPTCHA_VERIFY_URL, data=recaptcha_payload(token))
+            result = res.json()
+    except (httpx.HTTPError, ValueError):
+        return False
+    return bool(result.get('success'))
@@ -0,0 +1,67 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector
+from django.db import connection
+from django.db.models import F
+
+from rest_framework import filters
+
+
+SEARCH_CONFIG = 'english'
+
+
+def search_enabled():
+    """
+    Full-text search needs the Postgres search vector column
+    """
+    return connection.vendor == 'postgresql'
+
+
+def post_search_vector():
+    """
+    Weighted search vector over a post's title, description and content
+    """
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('content', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """
+    Recompute the stored search vector of the given posts
+    """
+    if search_enabled():
+        queryset.update(search_vector=post_search_vector())
+
+
+def prefix_search_query(terms):
+    """
+    Build a query matching every term, each as a word prefix
+    """
+    words = [word for term in terms for word in re.findall(r'\w+', term)]
+    if not words:
+        return None
+    raw = ' & '.join(f'{word}:*' for word in words)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    Ranked full-text search over posts on Postgres
+    Falls back to the plain search filter on other databases
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not search_enabled():
+            return super().filter_queryset(request, queryset, view)
+
+        query = prefix_search_query(self.get_search_terms(request))
+        if query is None:
+            return queryset
+
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-date_posted')
@@ -1,12 +1,13 @@
 
-import requests
 from rest_framework import serializers
-from rest_framework import status
 
-from django.conf import settings
+from django.core.files.storage import default_storage
 
 
 from core.models import Message, Photos, Portfolio, Resume, Skill, Tag, Category, Post
+from core.metrics import TimedSerializerMixin
+
+from blog.recaptcha import verify_recaptcha
 
 
 class CategoryListingField(serializers.RelatedField):
@@ -19,7 +20,30 @@ class TagsListingField(serializers.RelatedField):
         return value.name
 
 
-class TagSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Render stored image variants as a srcset and a blur placeholder
+    """
+
+    def to_representation(self, value):
+        if not value or not value.get('widths'):
+            return None
+        request = self.context.get('request')
+        sources = {}
+        for width, name in value['widths'].items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            sources[width] = url
+        return {
+            'srcset': ', '.join(
+                f'{url} {width}w' for width, url in sources.items()),
+            'sources': sources,
+            'placeholder': value.get('placeholder'),
+        }
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for tag object
     """
@@ -31,10 +55,16 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_Fields = ('id',)
 
     def get_post_count(self, obj):
-        return obj.post_set.all().count()
+        """
+        Use the count annotated by the queryset when available
+        """
+        post_count = getattr(obj, 'post_count', None)
+        if post_count is None:
+            post_count = obj.post_set.count()
+        return post_count
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for category object
     """
@@ -45,7 +75,32 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_Fields = ('id',)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class TaxonomyTagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer class for tag object with its materialized counts
+    """
+    post_count = serializers.IntegerField(read_only=True)
+    portfolio_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ('id', 'name', 'featured', 'post_count', 'portfolio_count')
+
+
+class TaxonomyCategorySerializer(TimedSerializerMixin,
+                                 serializers.ModelSerializer):
+    """
+    Serializer class for category object with its materialized counts
+    """
+    post_count = serializers.IntegerField(read_only=True)
+    portfolio_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ('id', 'name', 'post_count', 'portfolio_count')
+
+
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for post object
     """
@@ -57,12 +112,14 @@ class PostSerializer(serializers.ModelSerializer):
         many=True,
         queryset=Tag.objects.all()
     )
+    image_variants = ImageVariantsField()
 
     class Meta:
 
         model = Post
         fields = ('id', 'title', 'content', 'description', 'date_posted',
-                  'updated', 'category', 'tags', 'slug', 'image', 'featured')
+                  'updated', 'category', 'tags', 'slug', 'image',
+                  'image_variants', 'featured')
         read_only_Fields = ('id', 'date_posted', 'updated')
 
 
@@ -73,7 +130,8 @@ class PortfolioSerializer(PostSerializer):
     class Meta:
         model = Portfolio
         fields = ('id', 'title', 'content', 'date_posted', 'updated',
-                  'category', 'tags', 'slug', 'image', 'url')
+                  'category', 'tags', 'slug', 'image', 'image_variants',
+                  'url')
 
 
 class PostDetailSerializer(PostSerializer):
@@ -90,39 +148,40 @@ class PostDetailSerializer(PostSerializer):
     )
 
 
-class PhotosSerializer(serializers.ModelSerializer):
+class PostRenderedDetailSerializer(PostDetailSerializer):
+    """
+    Serializer class for post details with the content rendered to HTML
+    """
+    class Meta(PostDetailSerializer.Meta):
+        fields = PostDetailSerializer.Meta.fields + (
+            'content_html', 'toc', 'word_count', 'reading_time')
+
+
+class PhotosSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for photos list view
     """
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Photos
-        fields = ('id', 'title', 'caption', 'image')
+        fields = ('id', 'title', 'caption', 'image', 'image_variants')
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for message object
     """
     class Meta:
         model = Message
         fields = ('name', 'subject', 'comment', 'email', 'message_id')
-        read_only_Fields = ('message_id')
+        read_only_fields = ('message_id',)
 
     def to_internal_value(self, data):
-        payload = {
-            'secret': settings.RECAPTCHA_KEY,
-            'response': data.get('recaptchaToken')
-        }
-
-        res = requests.post(
-            'https://www.google.com/recaptcha/api/siteverify', data=payload)
-
-        result = res.json()
-
-        if not result['success']:
-            response = {}
-            response['error'] = 'Could not submit the form. Try again'
-            response['status'] = status.HTTP_400_BAD_REQUEST
+        # The async message view checks the token before the view runs
+        request = self.context.get('request')
+        if not getattr(request, 'recaptcha_verified', False) and \
+                not verify_recaptcha(data.get('recaptchaToken')):
             raise serializers.ValidationError(
                 {"captcha":
                  "Something went wrong. Refresh the page and  try again"})
@@ -130,7 +189,7 @@ class MessageSerializer(serializers.ModelSerializer):
         return super(MessageSerializer, self).to_internal_value(data)
 
 
-class ResumeSerializer(serializers.ModelSerializer):
+class ResumeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for resume object details view
     """
@@ -140,7 +199,7 @@ class ResumeSerializer(serializers.ModelSerializer):
         read_only_Fields = ('title', 'resume')
 
 
-class SkillSerializer(serializers.ModelSerializer):
+class SkillSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for skill object details view
     """
@@ -150,11 +209,13 @@ class SkillSerializer(serializers.ModelSerializer):
         read_only_Fields = ('title', 'percentage')
 
 
-class PostImageSerializer(serializers.ModelSerializer):
+class PostImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer class for downloading images to post model
     """
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Post
-        fields = ('slug', 'image')
+        fields = ('slug', 'image', 'image_variants')
         read_only_fields = ('slug',)
@@ -1,20 +1,20 @@
-from django.core.cache import cache
-from django.utils.text import slugify
-from core.models import Post
+from django.utils import timezone
+from core.models import Category, Portfolio, Post, Resume, Skill, Tag, \
+    TaxonomyCount
 
-from core.utils import send_email
+from core.jobs import enqueue
+from core.utils import (
+    bump_post_cache_version,
+    invalidate_photo_ids,
+    invalidate_post_cache,
+    invalidate_response_cache,
+    render_post,
+    unique_slugs
+)
 
 
-def create_slug(obj, field, instance, new_slug=None):
-    slug = slugify(field)
-    if new_slug is not None:
-        slug = new_slug
-    queryset = obj.objects.filter(slug=slug).order_by("-id")
-    exists = queryset.exists()
-    if exists:
-        new_slug = f'{slug}-{queryset.first().id}'
-        return create_slug(obj, field, instance, new_slug=new_slug)
-    return slug
+def create_slug(obj, field, instance):
+    return unique_slugs(obj, [field])[0]
 
 
 def pre_save_post_reciever(sender, instance, *args, **kwargs):
@@ -22,25 +22,203 @@ def pre_save_post_reciever(sender, instance, *args, **kwargs):
         instance.slug = create_slug(Post, instance.title, instance)
 
 
+def pre_save_post_render_reciever(sender, instance, update_fields=None,
+                                  *args, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        render_post(instance)
+
+
 def post_save_message_reciever(sender, instance, created, *args, **kwargs):
 
     if created:
-        try:
-            send_email(instance)
-        except Exception as e:
-            print(e)
-
+        enqueue('send_message_email', message_id=instance.pk)
 
-def _invalidate_cached_data(slug):
 
-    cache_key = f"post_details_{slug}"
-    cache.delete(cache_key)
+def _touch_posts(pks):
+    """
+    Move the cache version of posts on and point the detail cache at it
+    updated is left alone, it only follows edits of the post itself
+    Returns the timestamp written to the posts
+    """
+    now = timezone.now()
+    if not pks:
+        return now
+    queryset = Post.objects.filter(pk__in=pks)
+    queryset.update(cache_version=now)
+    invalidate_response_cache('posts')
+    for slug in queryset.values_list('slug', flat=True):
+        bump_post_cache_version(slug, now)
+    return now
 
 
 def blog_post_save_handler(sender, instance, created, **kwargs):
-    if not created:
-        _invalidate_cached_data(instance.slug)
+    bump_post_cache_version(instance.slug, instance.cache_version)
+
+
+def post_search_vector_handler(sender, instance, **kwargs):
+    # blog.search pulls in the DRF filters, keep them out of app loading
+    from blog.search import update_search_vectors
+
+    update_search_vectors(Post.objects.filter(pk=instance.pk))
 
 
 def blog_post_delete_handler(sender, instance, **kwargs):
-    _invalidate_cached_data(instance.slug)
+    invalidate_post_cache(instance.slug)
+
+
+def _tag_post_pks(tag_pks):
+    return list(Post.tags.through.objects.filter(
+        tag_id__in=tag_pks).values_list('post_id', flat=True).distinct())
+
+
+def blog_post_m2m_handler(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Invalidate posts when their tags or categories change
+    Details show the post count of every tag, so the other posts of an
+    added or removed tag are invalidated as well
+    """
+    tags = sender is Post.tags.through
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_post_pks = list(
+                instance.post_set.values_list('pk', flat=True))
+        elif tags:
+            instance._cleared_tag_pks = list(
+                instance.tags.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        pks = [instance.pk]
+        if tags:
+            if action == 'post_clear':
+                pk_set = getattr(instance, '_cleared_tag_pks', ())
+            pks += _tag_post_pks(pk_set)
+        instance.cache_version = _touch_posts(pks)
+    elif action == 'post_clear':
+        _touch_posts(getattr(instance, '_cleared_post_pks', None))
+    else:
+        pks = list(pk_set)
+        if tags:
+            pks += instance.post_set.values_list('pk', flat=True)
+        _touch_posts(pks)
+
+
+def post_tags_delete_handler(sender, instance, **kwargs):
+    """
+    Invalidate the posts sharing a tag with a post about to be deleted,
+    their details show the post count of the tag
+    """
+    pks = _tag_post_pks(instance.tags.values_list('pk', flat=True))
+    _touch_posts([pk for pk in pks if pk != instance.pk])
+
+
+def _is_portfolio(instance):
+    return isinstance(instance, Portfolio) or \
+        Portfolio.objects.filter(pk=instance.pk).exists()
+
+
+def _taxonomy_field(through):
+    return 'tag' if through is Post.tags.through else 'category'
+
+
+def taxonomy_count_m2m_handler(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """
+    Adjust the tag and category counters by the links that changed
+    Links about to be removed are read in the pre_ signals, since
+    pk_set holds every requested id and clear sends none
+    """
+    field = _taxonomy_field(sender)
+    if reverse:
+        own, other = f'{field}_id', 'post_id'
+    else:
+        own, other = 'post_id', f'{field}_id'
+    pending = instance.__dict__.setdefault('_taxonomy_links', {})
+
+    if action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.filter(**{own: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other}__in': pk_set})
+        pending[sender] = set(links.values_list(other, flat=True))
+        return
+    if action == 'post_add':
+        pks, sign = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        pks, sign = pending.pop(sender, ()), -1
+    else:
+        return
+    if not pks:
+        return
+
+    if reverse:
+        portfolios = Portfolio.objects.filter(pk__in=pks).count()
+        deltas = {instance.pk: (sign * len(pks), sign * portfolios)}
+    else:
+        portfolio = sign if _is_portfolio(instance) else 0
+        deltas = {pk: (sign, portfolio) for pk in pks}
+    TaxonomyCount.objects.adjust(field, deltas)
+
+
+def taxonomy_count_delete_handler(sender, instance, **kwargs):
+    """
+    Take a post out of the counters before its links are deleted
+    """
+    portfolio = -1 if _is_portfolio(instance) else 0
+    for through in (Post.tags.through, Post.category.through):
+        field = _taxonomy_field(through)
+        pks = through.objects.filter(post_id=instance.pk).values_list(
+            f'{field}_id', flat=True)
+        TaxonomyCount.objects.adjust(
+            field, {pk: (-1, portfolio) for pk in pks})
+
+
+def taxonomy_save_handler(sender, instance, created, **kwargs):
+    """
+    Invalidate posts when one of their tags or categories is edited
+    """
+    if not created:
+        _touch_posts(list(instance.post_set.values_list('pk', flat=True)))
+
+
+def taxonomy_delete_handler(sender, instance, **kwargs):
+    """
+    Invalidate posts before a tag or category they use is deleted
+    """
+    _touch_posts(list(instance.post_set.values_list('pk', flat=True)))
+
+
+def image_variants_handler(sender, instance, **kwargs):
+    """
+    Queue resized copies of a newly uploaded image
+    """
+    if instance.image and \
+            instance.image_variants.get('source') != instance.image.name:
+        enqueue(
+            'generate_image_variants',
+            model=instance._meta.label_lower,
+            pk=instance.pk
+        )
+
+
+RESPONSE_CACHE_TAGS = {
+    Post: 'posts',
+    Portfolio: 'posts',
+    Tag: 'tags',
+    Category: 'categories',
+    Skill: 'skills',
+    Resume: 'resumes',
+}
+
+
+def response_cache_handler(sender, **kwargs):
+    """
+    Invalidate the cached responses built from the saved or deleted model
+    """
+    invalidate_response_cache(RESPONSE_CACHE_TAGS[sender])
+
+
+def photos_change_handler(sender, instance, **kwargs):
+    invalidate_photo_ids()
@@ -0,0 +1,144 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, \
+    override_settings
+from django.urls import include, path, resolve, reverse
+
+from rest_framework import status
+
+from core.models import Message, Post
+
+from blog import async_views, views
+from blog.recaptcha import averify_recaptcha
+from blog.urls import router
+
+
+# The routes blog/urls.py serves when ASGI_MODE is set
+urlpatterns = [
+    path('api/blog/', include((async_views.async_urlpatterns(router.urls) + [
+        path('new-message/', async_views.create_message,
+             name='message-create'),
+    ], 'blog'))),
+]
+
+MESSAGE = {
+    'name': 'Paul',
+    'email': 'muteshi@muteshi.com',
+    'subject': 'Test subject',
+    'comment': 'comment here',
+    'recaptchaToken': 'token',
+}
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncUrlTests(SimpleTestCase):
+    """
+    Test the url patterns of the ASGI mode
+    """
+
+    def test_hot_views_are_async(self):
+        """Test that post, tag and photo routes get async views"""
+        for name in ('blog:post-list', 'blog:tag-list', 'blog:photos-list'):
+            match = resolve(reverse(name))
+            self.assertTrue(asyncio.iscoroutinefunction(match.func))
+
+        match = resolve(reverse('blog:post-list'))
+        self.assertIs(match.func.cls, views.PostViewSet)
+        self.assertTrue(match.func.csrf_exempt)
+
+    def test_other_views_stay_sync(self):
+        """Test that the other routes are left alone"""
+        match = resolve(reverse('blog:category-list'))
+
+        self.assertFalse(asyncio.iscoroutinefunction(match.func))
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TransactionTestCase):
+    """
+    Test the async views through the ASGI request handler
+    """
+
+    def setUp(self):
+        cache.clear()
+        # Every request gets a new pool thread here, have run_view close
+        # its connection instead of leaving it open in the finished thread
+        max_age = patch.dict(connection.settings_dict, CONN_MAX_AGE=0)
+        max_age.start()
+        self.addCleanup(max_age.stop)
+        self.client = AsyncClient()
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke', 'testpass')
+
+    async def test_post_list(self):
+        """Test that posts are listed by the async view"""
+        await self.create_post('Async post')
+
+        res = await self.client.get(reverse('blog:post-list'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['results'][0]['title'], 'Async post')
+
+    async def test_post_detail(self):
+        """Test that a post is retrieved by the async view"""
+        post = await self.create_post('Async post')
+
+        res = await self.client.get(
+            reverse('blog:post-detail', args=[post.slug]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['title'], 'Async post')
+
+    async def test_create_message(self):
+        """Test that a checked token skips the blocking check"""
+        with patch('blog.async_views.averify_recaptcha',
+                   return_value=True), \
+                patch('requests.post') as blocking:
+            res = await self.client.post(
+                reverse('blog:message-create'), MESSAGE)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        blocking.assert_not_called()
+        self.assertTrue(await self.message_exists())
+
+    async def test_create_message_failed_captcha(self):
+        """Test that a rejected token creates no message"""
+        with patch('blog.async_views.averify_recaptcha', return_value=False):
+            res = await self.client.post(
+                reverse('blog:message-create'), MESSAGE,
+                content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('captcha', res.json())
+        self.assertFalse(await self.message_exists())
+
+    async def create_post(self, title):
+        return await async_views.sync_to_async(Post.objects.create)(
+            author=self.user, title=title, content='Text')
+
+    async def message_exists(self):
+        return await async_views.sync_to_async(Message.objects.exists)()
+
+
+class AsyncRecaptchaTests(SimpleTestCase):
+    """
+    Test the reCAPTCHA check made with the async client
+    """
+
+    async def test_accepted(self):
+        """Test that an accepted token passes"""
+        res = httpx.Response(200, json={'success': True})
+        with patch.object(httpx.AsyncClient, 'post', return_value=res):
+            self.assertTrue(await averify_recaptcha('token'))
+
+    async def test_timeout(self):
+        """Test that a timed out check fails"""
+        with patch.object(httpx.AsyncClient, 'post',
+                          side_effect=httpx.ConnectTimeout('timeout')):
+            self.assertFalse(await averify_recaptcha('token'))
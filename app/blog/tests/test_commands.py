@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Category, Post, Tag, TaxonomyCount
+
+
+def sample_record(**params):
+    record = {
+        'title': 'Imported post',
+        'content': 'Some **imported** words',
+        'author': 'test@muteshi.co.ke',
+        'tags': ['Django'],
+        'category': ['Python'],
+    }
+    record.update(params)
+    return record
+
+
+class PostImportExportTests(TestCase):
+    """
+    Test the NDJSON import and export commands
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke', 'testpass')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'posts.ndjson')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_records(self, records):
+        with open(self.path, 'w') as stream:
+            for record in records:
+                stream.write(json.dumps(record) + '\n')
+
+    def test_import_posts(self):
+        """Test that posts are created with their tags and categories"""
+        tag = Tag.objects.create(user=self.user, name='Django')
+        self.write_records([
+            sample_record(),
+            sample_record(tags=['Django', 'Celery'], category=[]),
+        ])
+
+        call_command('import_posts', self.path, stdout=StringIO())
+
+        posts = Post.objects.order_by('id')
+        self.assertEqual(posts.count(), 2)
+        self.assertEqual(posts[0].slug, 'imported-post')
+        self.assertEqual(posts[1].slug, 'imported-post-2')
+        self.assertIn('<strong>imported</strong>', posts[0].content_html)
+        self.assertEqual(list(posts[0].tags.all()), [tag])
+        self.assertEqual(
+            sorted(posts[1].tags.values_list('name', flat=True)),
+            ['Celery', 'Django'])
+        self.assertEqual(Tag.objects.filter(name='Django').count(), 1)
+        self.assertEqual(TaxonomyCount.objects.get(tag=tag).post_count, 2)
+        self.assertEqual(posts[0].category.get().name, 'Python')
+
+    def test_import_query_count_independent_of_size(self):
+        """Test that a batch is written with a fixed number of queries"""
+        self.write_records(
+            sample_record(title=f'Post {i}', tags=[f'Tag {i}'])
+            for i in range(3))
+        with self.assertNumQueries(18):
+            call_command('import_posts', self.path, stdout=StringIO())
+
+        self.write_records(
+            sample_record(title=f'Other {i}', tags=[f'Other {i}'],
+                          category=['Other'])
+            for i in range(30))
+        with self.assertNumQueries(18):
+            call_command('import_posts', self.path, stdout=StringIO())
+
+        self.assertEqual(Post.objects.count(), 33)
+
+    def test_import_unknown_author(self):
+        """Test that records of unknown authors are refused"""
+        self.write_records([sample_record(author='nobody@muteshi.co.ke')])
+
+        with self.assertRaises(CommandError):
+            call_command('import_posts', self.path, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+    def test_import_single_name(self):
+        """Test that a tag or category given as a string is one name"""
+        self.write_records([sample_record(tags='Django', category='Python')])
+
+        call_command('import_posts', self.path, stdout=StringIO())
+
+        post = Post.objects.get()
+        self.assertEqual(
+            list(post.tags.values_list('name', flat=True)), ['Django'])
+        self.assertEqual(post.category.get().name, 'Python')
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_import_invalid_names(self):
+        """Test that tags which are not a list of names are refused"""
+        self.write_records([sample_record(tags={'name': 'Django'})])
+
+        with self.assertRaisesRegex(CommandError, 'tags must be a list'):
+            call_command('import_posts', self.path, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+    def test_export_import_round_trip(self):
+        """Test that exported posts are imported back unchanged"""
+        tag = Tag.objects.create(user=self.user, name='Django')
+        category = Category.objects.create(user=self.user, name='Python')
+        post = Post.objects.create(
+            author=self.user, title='Exported', content='Body text')
+        post.tags.add(tag)
+        post.category.add(category)
+        date_posted = Post.objects.get(pk=post.pk).date_posted
+
+        out = StringIO()
+        call_command('export_posts', stdout=out, stderr=StringIO())
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['slug'], 'exported')
+        self.assertEqual(records[0]['tags'], ['Django'])
+
+        Post.objects.all().delete()
+        self.write_records(records)
+        call_command('import_posts', self.path, stdout=StringIO())
+
+        imported = Post.objects.get()
+        self.assertEqual(imported.slug, 'exported')
+        self.assertEqual(imported.date_posted, date_posted)
+        self.assertEqual(list(imported.tags.all()), [tag])
+        self.assertEqual(list(imported.category.all()), [category])
@@ -0,0 +1,171 @@
+import io
+import shutil
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.jobs import run_pending_jobs
+from core.models import Job, Photos
+
+
+PHOTOS_URL = reverse('blog:photos-list')
+
+
+def test_photo(user, title='Test photo'):
+    """
+    Create and return a sample test photo
+    """
+    return Photos.objects.create(user=user, title=title, caption='Caption')
+
+
+class PublicPhotosApiTests(TestCase):
+    """
+    Test random photo selection
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'muteshi@muteshi.com',
+            'password'
+        )
+
+    def test_no_photos(self):
+        """
+        Test that an empty gallery returns an empty list
+        """
+        res = self.client.get(PHOTOS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_random_photo(self):
+        """
+        Test that a single random photo is returned by default
+        """
+        photos = [test_photo(self.user, f'Photo {i}') for i in range(5)]
+
+        res = self.client.get(PHOTOS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertIn(res.data[0]['id'], [photo.id for photo in photos])
+
+    def test_random_photos_count(self):
+        """
+        Test that several distinct photos are returned in one query
+        """
+        for i in range(5):
+            test_photo(self.user, f'Photo {i}')
+        self.client.get(PHOTOS_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(PHOTOS_URL, {'count': 3})
+
+        ids = [photo['id'] for photo in res.data]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_new_photo_invalidates_ids(self):
+        """
+        Test that a newly added photo can be picked
+        """
+        self.client.get(PHOTOS_URL)
+        photo = test_photo(self.user)
+
+        res = self.client.get(PHOTOS_URL)
+
+        self.assertEqual(res.data[0]['id'], photo.id)
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PhotoImageVariantsTests(TestCase):
+    """
+    Test generation of resized photo images
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'muteshi@muteshi.com',
+            'password'
+        )
+
+    def upload(self, size=(800, 400)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color='red').save(buffer, format='JPEG')
+        return SimpleUploadedFile(
+            'photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_generated_off_request(self):
+        """
+        Test that uploads queue a job generating WebP copies
+        """
+        photo = Photos.objects.create(
+            user=self.user, title='Photo', caption='Caption',
+            image=self.upload())
+        self.assertEqual(photo.image_variants, {})
+        self.assertTrue(
+            Job.objects.filter(name='generate_image_variants').exists())
+
+        run_pending_jobs()
+
+        photo.refresh_from_db()
+        self.assertEqual(
+            list(photo.image_variants['widths']), ['320', '640', '800'])
+        with Image.open(photo.image.storage.open(
+                photo.image_variants['widths']['320'])) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (320, 160))
+        self.assertTrue(photo.image_variants['placeholder'].startswith(
+            'data:image/webp;base64,'))
+
+    def test_variants_in_response(self):
+        """
+        Test that photos expose a srcset of their variants
+        """
+        Photos.objects.create(
+            user=self.user, title='Photo', caption='Caption',
+            image=self.upload(size=(200, 100)))
+        run_pending_jobs()
+
+        res = self.client.get(PHOTOS_URL)
+
+        variants = res.data[0]['image_variants']
+        self.assertEqual(list(variants['sources']), ['200'])
+        self.assertTrue(variants['srcset'].endswith(' 200w'))
+
+    def test_non_image_not_retried(self):
+        """
+        Test that a file which is not an image is only tried once
+        """
+        photo = Photos.objects.create(
+            user=self.user, title='Photo', caption='Caption',
+            image=SimpleUploadedFile('photo.jpg', b'not an image'))
+        run_pending_jobs()
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.image_variants, {'source': photo.image.name})
+
+        photo.title = 'New title'
+        photo.save()
+        self.assertFalse(Job.objects.filter(
+            name='generate_image_variants', status=Job.PENDING).exists())
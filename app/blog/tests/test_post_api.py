@@ -1,20 +1,23 @@
 import tempfile
+import unittest
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Post, Skill, Tag, Category
+from core.models import Portfolio, Post, Skill, Tag, Category
 
 from blog.serializers import PostSerializer
 
 POSTS_URL = reverse('blog:post-list')
+PORTFOLIOS_URL = reverse('blog:portfolio-list')
 
 
 def image_upload_url(post_id):
@@ -111,7 +114,7 @@ class PrivatePostApiTests(TestCase):
 
         res = self.client.get(POSTS_URL)
 
-        posts = Post.objects.all().order_by('title')
+        posts = Post.objects.order_by('-date_posted', '-id')
         serializer = PostSerializer(posts, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['results'], serializer.data)
@@ -157,6 +160,99 @@ class PrivatePostApiTests(TestCase):
 
         self.assertEqual(res1.data, res2.data)
 
+    def test_details_post_served_from_cache(self):
+        """
+        Test that a cached post detail is returned without database queries
+        """
+        post = test_post(user=self.user)
+        post.tags.add(test_tag(user=self.user))
+        url = detail_post_url(post.slug)
+        res1 = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            res2 = self.client.get(url)
+
+        self.assertEqual(res1.data, res2.data)
+
+    def test_details_post_tag_post_count(self):
+        """
+        Test that tags in post details report their post count
+        """
+        tag = test_tag(user=self.user)
+        post1 = test_post(user=self.user)
+        post2 = test_post(user=self.user)
+        post1.tags.add(tag)
+        post2.tags.add(tag)
+
+        res = self.client.get(detail_post_url(post1.slug))
+
+        self.assertEqual(res.data['tags'][0]['post_count'], 2)
+
+    def test_details_post_count_invalidated(self):
+        """
+        Test that tagging or deleting another post refreshes the post count
+        """
+        tag = test_tag(user=self.user)
+        post1 = test_post(user=self.user)
+        post2 = test_post(user=self.user)
+        post1.tags.add(tag)
+        url = detail_post_url(post1.slug)
+        res = self.client.get(url)
+        self.assertEqual(res.data['tags'][0]['post_count'], 1)
+
+        post2.tags.add(tag)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['post_count'], 2)
+
+        post2.delete()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['post_count'], 1)
+
+    def test_details_post_rendered_html(self):
+        """
+        Test that post details include sanitized HTML when asked for
+        """
+        post = test_post(
+            user=self.user,
+            content='# Intro\n\nSome *text* <script>alert(1)</script>'
+        )
+        url = detail_post_url(post.slug)
+
+        res = self.client.get(url)
+        self.assertNotIn('content_html', res.data)
+
+        res = self.client.get(url, {'content_format': 'html'})
+        self.assertIn('<h1 id="intro">Intro</h1>', res.data['content_html'])
+        self.assertIn('<em>text</em>', res.data['content_html'])
+        self.assertNotIn('<script>', res.data['content_html'])
+        self.assertEqual(res.data['toc'][0]['id'], 'intro')
+        self.assertEqual(res.data['word_count'], 5)
+        self.assertEqual(res.data['reading_time'], 1)
+
+    def test_details_post_cache_invalidated(self):
+        """
+        Test that updating a post or its tags refreshes the cached details
+        """
+        post = test_post(user=self.user)
+        url = detail_post_url(post.slug)
+        self.client.get(url)
+
+        post.title = 'Updated title'
+        post.save()
+        res = self.client.get(url)
+        self.assertEqual(res.data['title'], post.title)
+
+        tag = test_tag(user=self.user, name='Cached tag')
+        post.tags.add(tag)
+        res = self.client.get(url)
+        self.assertEqual(res.data['tags'][0]['name'], tag.name)
+
+        tag.post_set.clear()
+        res = self.client.get(url)
+        self.assertEqual(res.data['tags'], [])
+
     def test_create_basic_post(self):
         """
         Test creating a new post
@@ -372,6 +468,31 @@ class PostImageUploadTests(TestCase):
         self.assertIn(serializer3.data, res.data['results'])
         self.assertEqual(len(res.data['results']), 2)
 
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', 'Full-text search needs Postgres'
+    )
+    def test_full_text_search_ranked(self):
+        """
+        Test that full-text search matches word prefixes and ranks title
+        matches above content matches
+        """
+        post1 = test_post(user=self.user, title='Kubernetes tips',
+                          content='Running containers')
+        post2 = test_post(user=self.user, title='Weekend notes',
+                          content='Trying out kubernetes at home')
+        test_post(user=self.user, title='Unrelated', content='Nothing here')
+
+        res = self.client.get(POSTS_URL, {'search': 'kuber'})
+
+        slugs = [post['slug'] for post in res.data['results']]
+        self.assertEqual(slugs, [post1.slug, post2.slug])
+
+        res = self.client.get(
+            POSTS_URL, {'search': 'kuber', 'pagination': 'cursor'})
+
+        slugs = [post['slug'] for post in res.data['results']]
+        self.assertEqual(slugs, [post1.slug, post2.slug])
+
     def test_posts_pagination(self):
         """
         Test that pagination is applied
@@ -383,8 +504,211 @@ class PostImageUploadTests(TestCase):
 
         res = self.client.get(POSTS_URL)
 
-        posts = Post.objects.all().order_by('title')
+        posts = Post.objects.order_by('-date_posted', '-id')
         serializer = PostSerializer(posts, many=True)
 
         self.assertEqual(res.data['results'], serializer.data)
         self.assertEqual(res.data['count'], len(res.data['results']))
+
+
+class PostListQueryBenchmarkTests(TestCase):
+    """
+    Benchmark the number of queries needed to render a page of posts
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke',
+            'testpass'
+        )
+        tag = test_tag(user=self.user)
+        category = test_category(user=self.user)
+        for i in range(30):
+            post = test_post(user=self.user, title=f'Post {i}')
+            post.tags.add(tag)
+            post.category.add(category)
+            portfolio = Portfolio.objects.create(
+                author=self.user,
+                title=f'Portfolio {i}',
+                slug=f'portfolio-{i}',
+                content='testing content',
+                url='https://muteshi.com'
+            )
+            portfolio.tags.add(tag)
+            portfolio.category.add(category)
+
+    def test_post_list_queries_per_page(self):
+        """
+        Test that a page of posts costs the same queries whatever its size
+        """
+        # validators, count, page, tags and categories
+        for page_size in (1, 10, 60):
+            with self.assertNumQueries(5):
+                res = self.client.get(POSTS_URL, {'page_size': page_size})
+            self.assertEqual(len(res.data['results']), page_size)
+            self.assertEqual(res.data['results'][0]['tags'], ['Test Tag'])
+
+    def test_portfolio_list_queries_per_page(self):
+        """
+        Test that a page of portfolios costs the same queries whatever
+        its size
+        """
+        for page_size in (1, 10, 30):
+            with self.assertNumQueries(5):
+                res = self.client.get(
+                    PORTFOLIOS_URL, {'page_size': page_size}
+                )
+            self.assertEqual(len(res.data['results']), page_size)
+            self.assertEqual(
+                res.data['results'][0]['category'], ['Testing category']
+            )
+
+
+class PostCursorPaginationTests(TestCase):
+    """
+    Test keyset pagination of post listings
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke',
+            'testpass'
+        )
+        self.posts = [
+            test_post(user=self.user, title=f'Post {i}') for i in range(5)
+        ]
+
+    def test_cursor_pages_cover_all_posts(self):
+        """
+        Test that following next links returns every post once, newest first
+        """
+        res = self.client.get(
+            POSTS_URL, {'pagination': 'cursor', 'page_size': 2}
+        )
+        self.assertNotIn('count', res.data)
+        self.assertIsNone(res.data['previous'])
+
+        ids = [post['id'] for post in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [post['id'] for post in res.data['results']]
+
+        expected = [post.id for post in reversed(self.posts)]
+        self.assertEqual(ids, expected)
+
+    def test_cursor_stable_under_inserts(self):
+        """
+        Test that posts created between requests do not shift pages
+        """
+        res = self.client.get(
+            POSTS_URL, {'pagination': 'cursor', 'page_size': 2}
+        )
+        test_post(user=self.user, title='Newer post')
+
+        res = self.client.get(res.data['next'])
+        ids = [post['id'] for post in res.data['results']]
+        self.assertEqual(ids, [self.posts[2].id, self.posts[1].id])
+
+        res = self.client.get(res.data['previous'])
+        ids = [post['id'] for post in res.data['results']]
+        self.assertEqual(ids, [self.posts[4].id, self.posts[3].id])
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor returns not found
+        """
+        res = self.client.get(POSTS_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConditionalPostApiTests(TestCase):
+    """
+    Test ETag and Last-Modified validators on post endpoints
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke',
+            'testpass'
+        )
+        self.post = test_post(user=self.user)
+
+    def test_post_list_not_modified(self):
+        """
+        Test that a matching ETag returns 304 without serializing posts
+        """
+        res = self.client.get(POSTS_URL)
+        etag = res['ETag']
+        self.assertIn('Last-Modified', res)
+
+        # The validators are stored with the cached response
+        with self.assertNumQueries(0):
+            res = self.client.get(POSTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_post_list_modified(self):
+        """
+        Test that editing or tagging a post changes the list ETag
+        """
+        etag = self.client.get(POSTS_URL)['ETag']
+
+        self.post.tags.add(test_tag(user=self.user))
+        res = self.client.get(POSTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_post_detail_not_modified(self):
+        """
+        Test conditional requests on post details
+        """
+        url = detail_post_url(self.post.slug)
+        res = self.client.get(url)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        res = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.post.title = 'Changed title'
+        self.post.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Changed title')
+
+    def test_post_detail_taxonomy_change(self):
+        """
+        Test that renaming a tag revalidates posts without updating them
+        """
+        tag = test_tag(user=self.user)
+        self.post.tags.add(tag)
+        self.post.refresh_from_db()
+        updated = self.post.updated
+        url = detail_post_url(self.post.slug)
+        etag = self.client.get(url)['ETag']
+
+        tag.name = 'Renamed tag'
+        tag.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Renamed tag')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.updated, updated)
+
+    def test_missing_post_detail(self):
+        """
+        Test that unknown posts still return not found
+        """
+        res = self.client.get(detail_post_url('no-such-post'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
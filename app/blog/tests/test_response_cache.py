@@ -0,0 +1,127 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Post, Skill, Tag
+
+SKILLS_URL = reverse('blog:skill-list')
+POSTS_URL = reverse('blog:post-list')
+TAGS_URL = reverse('blog:tag-list')
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Test the response cache of anonymous GET requests
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke', 'testpass')
+        Skill.objects.create(user=self.user, title='HTML', percentage=5)
+
+    def test_anonymous_response_cached(self):
+        """Test that a repeated anonymous request skips the database"""
+        res = self.client.get(SKILLS_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(SKILLS_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, res.content)
+        self.assertEqual(cached['Content-Type'], res['Content-Type'])
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    def test_query_string_is_part_of_key(self):
+        """Test that different query strings are cached apart"""
+        for i in range(3):
+            Post.objects.create(
+                author=self.user, title=f'Post {i}', content='Text')
+        first = self.client.get(POSTS_URL, {'page_size': 1})
+        second = self.client.get(POSTS_URL, {'page_size': 1, 'page': 2})
+
+        self.assertNotEqual(first.content, second.content)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'muteshi.com'])
+    def test_host_and_scheme_are_part_of_key(self):
+        """Test that absolute pagination links never leak across hosts"""
+        for i in range(3):
+            Post.objects.create(
+                author=self.user, title=f'Post {i}', content='Text')
+        self.client.get(POSTS_URL, {'page_size': 1})
+
+        other_host = self.client.get(
+            POSTS_URL, {'page_size': 1}, HTTP_HOST='muteshi.com')
+        secure = self.client.get(POSTS_URL, {'page_size': 1}, secure=True)
+
+        self.assertTrue(
+            other_host.json()['next'].startswith('http://muteshi.com/'))
+        self.assertTrue(
+            secure.json()['next'].startswith('https://testserver/'))
+
+    def test_tag_invalidation(self):
+        """Test that saving a model only invalidates its own tags"""
+        self.client.get(SKILLS_URL)
+        self.client.get(TAGS_URL)
+
+        Tag.objects.create(user=self.user, name='Django')
+        with self.assertNumQueries(0):
+            self.client.get(SKILLS_URL)
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(len(res.data), 1)
+
+        # Tags carry post counts, so posts invalidate them as well
+        Post.objects.create(author=self.user, title='Post', content='Text')
+        with self.assertNumQueries(0):
+            self.client.get(SKILLS_URL)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(TAGS_URL)
+        self.assertTrue(context.captured_queries)
+
+        Skill.objects.create(user=self.user, title='CSS', percentage=5)
+        res = self.client.get(SKILLS_URL)
+        self.assertEqual(len(res.data), 2)
+
+    def test_authenticated_response_not_cached(self):
+        """Test that authenticated requests always reach the view"""
+        self.client.force_authenticate(self.user)
+        self.client.get(TAGS_URL)
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(context.captured_queries)
+
+    @patch('blog.views.wait_for_cache')
+    def test_concurrent_miss_waits_for_lock_holder(self, wait_for_cache):
+        """Test that a miss waits for the request already rendering it"""
+        wait_for_cache.return_value = {
+            'content': b'[]',
+            'status': 200,
+            'headers': {'Content-Type': 'application/json'},
+        }
+        with patch('blog.views.cache.add', return_value=False):
+            with self.assertNumQueries(0):
+                res = self.client.get(SKILLS_URL)
+
+        self.assertEqual(res.content, b'[]')
+        wait_for_cache.assert_called_once()
+
+    @patch('blog.views.wait_for_cache', return_value=None)
+    def test_concurrent_miss_renders_after_wait(self, wait_for_cache):
+        """Test that a request renders itself when the wait runs out"""
+        with patch('blog.views.cache.add', return_value=False):
+            res = self.client.get(SKILLS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
@@ -42,3 +42,19 @@ class PrivateSkillsApiTests(TestCase):
         serializer = SkillSerializer(skills, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
+
+    def test_skills_not_modified(self):
+        """
+        Test that unchanged skills answer conditional requests with 304
+        """
+        skill = Skill.objects.create(user=self.user, title='HTML',
+                                     percentage=5)
+        etag = self.client.get(SKILLS_URL)['ETag']
+
+        res = self.client.get(SKILLS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        skill.percentage = 9
+        skill.save()
+        res = self.client.get(SKILLS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -137,3 +137,44 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_tags_post_count(self):
+        """
+        Test that tags report the number of posts they are assigned to
+        """
+        tag1 = Tag.objects.create(user=self.user, name='Python')
+        tag2 = Tag.objects.create(user=self.user, name='Django')
+        for title in ('First post', 'Second post'):
+            post = Post.objects.create(
+                author=self.user, title=title, content='Testing content')
+            post.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['name'], tag1.name)
+        self.assertEqual(res.data[0]['post_count'], 2)
+        self.assertEqual(TagSerializer(tag2).data['post_count'], 0)
+
+    def test_tags_list_query_count(self):
+        """
+        Test that listing tags runs a constant number of queries
+        """
+        post = Post.objects.create(
+            author=self.user, title='Tagged post', content='Testing content')
+        for i in range(2):
+            post.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+        self.client.get(TAGS_URL)
+
+        # two validator queries and the annotated tag listing
+        with self.assertNumQueries(3):
+            self.client.get(TAGS_URL)
+
+        for i in range(2, 20):
+            post.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(TAGS_URL)
+        self.assertEqual(len(res.data), 20)
+        self.assertTrue(all(tag['post_count'] == 1 for tag in res.data))
@@ -0,0 +1,143 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Category, Portfolio, Post, Tag, TaxonomyCount
+
+TAXONOMY_URL = reverse('blog:taxonomy-list')
+
+
+def counts_of(obj):
+    counts = TaxonomyCount.objects.get(**{obj._meta.model_name: obj})
+    return counts.post_count, counts.portfolio_count
+
+
+class TaxonomyApiTests(TestCase):
+    """
+    Test the tag and category aggregate endpoint and its counters
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke', 'testpass')
+        self.tag = Tag.objects.create(user=self.user, name='Django')
+        self.category = Category.objects.create(user=self.user, name='Python')
+
+    def create_post(self, model=Post, **params):
+        defaults = {'author': self.user, 'title': 'Post', 'content': 'Text'}
+        if model is Portfolio:
+            defaults['url'] = 'https://muteshi.co.ke'
+        defaults.update(params)
+        return model.objects.create(**defaults)
+
+    def test_list_taxonomy_counts(self):
+        """Test that tags and categories come with their counts"""
+        post = self.create_post()
+        portfolio = self.create_post(Portfolio, title='Portfolio')
+        post.tags.add(self.tag)
+        portfolio.tags.add(self.tag)
+        portfolio.category.add(self.category)
+        Tag.objects.create(user=self.user, name='Unused')
+
+        res = self.client.get(TAXONOMY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'], [
+            {'id': self.tag.id, 'name': 'Django', 'featured': False,
+             'post_count': 2, 'portfolio_count': 1},
+            {'id': self.tag.id + 1, 'name': 'Unused', 'featured': False,
+             'post_count': 0, 'portfolio_count': 0},
+        ])
+        self.assertEqual(res.data['categories'], [
+            {'id': self.category.id, 'name': 'Python',
+             'post_count': 1, 'portfolio_count': 1},
+        ])
+
+    def test_list_taxonomy_query_count(self):
+        """Test that the endpoint does not count posts per request"""
+        for i in range(5):
+            post = self.create_post(title=f'Post {i}')
+            post.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+            post.category.add(self.category)
+
+        with self.assertNumQueries(5):
+            res = self.client.get(TAXONOMY_URL)
+
+        self.assertEqual(len(res.data['tags']), 6)
+        self.assertEqual(
+            self.client.get(
+                TAXONOMY_URL, HTTP_IF_NONE_MATCH=res['ETag']).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_counts_follow_forward_changes(self):
+        """Test adding, removing and clearing tags of a post"""
+        other = Tag.objects.create(user=self.user, name='Other')
+        post = self.create_post()
+        post.tags.add(self.tag, other)
+        post.tags.add(self.tag)
+        self.assertEqual(counts_of(self.tag), (1, 0))
+
+        post.tags.remove(self.tag)
+        post.tags.remove(self.tag)
+        self.assertEqual(counts_of(self.tag), (0, 0))
+        self.assertEqual(counts_of(other), (1, 0))
+
+        post.tags.clear()
+        self.assertEqual(counts_of(other), (0, 0))
+
+    def test_counts_follow_reverse_changes(self):
+        """Test adding, removing and clearing posts of a category"""
+        post = self.create_post()
+        portfolio = self.create_post(Portfolio, title='Portfolio')
+        self.category.post_set.add(post, portfolio)
+        self.assertEqual(counts_of(self.category), (2, 1))
+
+        self.category.post_set.remove(portfolio)
+        self.assertEqual(counts_of(self.category), (1, 0))
+
+        self.category.post_set.clear()
+        self.assertEqual(counts_of(self.category), (0, 0))
+
+    def test_counts_follow_deletes(self):
+        """Test that deleting posts and portfolios decrements the counts"""
+        post = self.create_post()
+        portfolio = self.create_post(Portfolio, title='Portfolio')
+        post.tags.add(self.tag)
+        portfolio.tags.add(self.tag)
+        self.assertEqual(counts_of(self.tag), (2, 1))
+
+        portfolio.delete()
+        self.assertEqual(counts_of(self.tag), (1, 0))
+
+        post.delete()
+        self.assertEqual(counts_of(self.tag), (0, 0))
+
+    def test_adjust_routes_writes(self):
+        """Test that counters are written to the database of the manager"""
+        with patch('core.models.router.db_for_write',
+                   return_value='default') as db_for_write:
+            TaxonomyCount.objects.adjust('tag', {self.tag.pk: (1, 0)})
+
+        db_for_write.assert_called_once_with(TaxonomyCount)
+        self.assertEqual(counts_of(self.tag), (1, 0))
+
+    def test_recount_taxonomy(self):
+        """Test that the recount command rebuilds the counters"""
+        post = self.create_post()
+        post.tags.add(self.tag)
+        post.category.add(self.category)
+        TaxonomyCount.objects.update(post_count=10)
+
+        call_command('recount_taxonomy', stdout=StringIO())
+
+        self.assertEqual(counts_of(self.tag), (1, 0))
+        self.assertEqual(counts_of(self.category), (1, 0))
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
@@ -12,6 +13,7 @@ router.register('portfolios', views.PortfolioViewSet)
 router.register('resumes', views.ResumeViewSet)
 router.register('skills', views.SkillViewSet)
 router.register('photos', views.PhotosViewSet)
+router.register('taxonomy', views.TaxonomyViewSet, basename='taxonomy')
 
 app_name = 'blog'
 
@@ -22,3 +24,11 @@ urlpatterns = [
          name='message-create'),
 
 ]
+
+if settings.ASGI_MODE:
+    from blog import async_views
+
+    urlpatterns = async_views.async_urlpatterns(router.urls) + [
+        path('new-message/', async_views.create_message,
+             name='message-create'),
+    ]
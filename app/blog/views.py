@@ -1,27 +1,228 @@
-from random import choice
+import hashlib
+from functools import partial
+from random import sample
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Max, OuterRef, \
+    Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework import filters
 from rest_framework.generics import CreateAPIView
 
-from core.utils import caching, id_generator
-from core.models import Category, Message, Photos, Portfolio, Resume, Skill, Tag, Post
+from core.authentication import CachedTokenAuthentication, \
+    SignedTokenAuthentication
+from core.metrics import record_cache
+from core.utils import RESPONSE_CACHE_LOCK_TIMEOUT, \
+    RESPONSE_CACHE_TIMEOUT, cache_post, get_cached_post, \
+    get_cached_post_version, get_photo_ids, get_response_generations, \
+    wait_for_cache
+from core.models import Category, Message, Photos, Portfolio, Resume, \
+    Skill, Tag, Post, TaxonomyCount
 
 from blog import serializers
+from blog.pagination import StandardResultsSetPagination, \
+    PostCursorPagination
+from blog.search import PostSearchFilter
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+def annotate_taxonomy_counts(queryset):
+    """
+    Annotate tags or categories with their materialized counts
+    """
+    return queryset.annotate(
+        post_count=Coalesce('counts__post_count', 0),
+        portfolio_count=Coalesce('counts__portfolio_count', 0),
+    )
+
+
+def annotate_post_count(queryset):
+    """
+    Annotate tags with their post count in the same query
+    A correlated subquery keeps the count independent of any joins
+    the queryset filters on
+    """
+    post_count = Post.tags.through.objects.filter(
+        tag=OuterRef('pk')
+    ).order_by().values('tag').annotate(count=Count('*')).values('count')
+    return queryset.annotate(post_count=Coalesce(
+        Subquery(post_count, output_field=IntegerField()), 0
+    ))
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional GET requests before the serializer runs
+    Validators come from the newest updated timestamp and the row count
+    of the querysets a response is built from, posts use their
+    cache_version instead
+    """
+
+    def get_validator_querysets(self):
+        """
+        Return the querysets whose rows make up the response
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        return [queryset]
+
+    def get_validator_field(self, queryset):
+        """
+        Return the timestamp that changes with what the rows render
+        """
+        if issubclass(queryset.model, Post):
+            return 'cache_version'
+        return 'updated'
+
+    def make_etag(self, *parts):
+        parts = (self.request.get_full_path(), self.request.user.pk) + parts
+        key = ':'.join(str(part) for part in parts)
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def get_validators(self):
+        """
+        Return the ETag and last modified time of the response
+        """
+        parts = []
+        last_modified = None
+        for queryset in self.get_validator_querysets():
+            stats = queryset.order_by().aggregate(
+                last=Max(self.get_validator_field(queryset)),
+                count=Count('pk')
+            )
+            parts += [stats['count'], stats['last']]
+            if stats['last'] and (
+                    last_modified is None or stats['last'] > last_modified):
+                last_modified = stats['last']
+        return self.make_etag(*parts), last_modified
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            if etag:
+                response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class ResponseCacheMixin:
+    """
+    Cache the rendered responses of anonymous GET requests
+    Entries are keyed on the full path, the renderer and the generation of
+    every tag in cache_tags, so invalidating a tag orphans its responses.
+    On a miss a single request renders the response while the others wait
+    for it to be stored
+    """
+    cache_tags = ()
+    response_cache_wait = 2
+
+    def get_response_cache_key(self, request):
+        """
+        Return the cache key of the response, None when it is not cached
+        """
+        if request.method not in ('GET', 'HEAD') or \
+                'HTTP_AUTHORIZATION' in request.META or \
+                not request.user.is_anonymous:
+            return None
+        # Paginated bodies hold absolute links, so scheme and host count
+        path = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        generations = get_response_generations(self.cache_tags)
+        return (f'response_{path}_{request.accepted_renderer.format}'
+                f':{generations}')
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        self._response_cache_key = self.get_response_cache_key(request)
+        self._response_cache_lock = None
+        if self._response_cache_key is None:
+            return handler(request, *args, **kwargs)
+
+        entry = cache.get(self._response_cache_key)
+        if entry is None:
+            lock = f'{self._response_cache_key}:lock'
+            if cache.add(lock, 1, RESPONSE_CACHE_LOCK_TIMEOUT):
+                self._response_cache_lock = lock
+            else:
+                entry = wait_for_cache(
+                    self._response_cache_key, self.response_cache_wait)
+        record_cache(hits=entry is not None, misses=entry is None)
+        if entry is None:
+            return handler(request, *args, **kwargs)
+
+        self._response_cache_key = None
+        return self.cached_entry_response(request, entry)
+
+    def cached_entry_response(self, request, entry):
+        headers = entry['headers']
+        response = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(
+                headers.get('Last-Modified', ''))
+        )
+        if response is None:
+            response = HttpResponse(entry['content'], status=entry['status'])
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def store_response(self, key, lock, response):
+        cache.set(key, {
+            'content': response.content,
+            'status': response.status_code,
+            'headers': dict(response.items()),
+        }, RESPONSE_CACHE_TIMEOUT)
+        if lock:
+            cache.delete(lock)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        key = getattr(self, '_response_cache_key', None)
+        if key is not None:
+            if isinstance(response, Response) and \
+                    response.status_code == status.HTTP_200_OK:
+                response.add_post_render_callback(partial(
+                    self.store_response, key, self._response_cache_lock))
+            elif self._response_cache_lock:
+                cache.delete(self._response_cache_lock)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
 
 
 class MainBlogAppViewSet(
+    ConditionalGetMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.CreateModelMixin
@@ -29,7 +230,8 @@ class MainBlogAppViewSet(
     """
     Base viewset for user owned blog attributes
     """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication, SignedTokenAuthentication)
     permission_classes = (IsAuthenticated,)
     http_method_names = ['get', 'head']
 
@@ -43,14 +245,15 @@ class MainBlogAppViewSet(
         queryset = self.queryset
 
         if assigned_only:
-            queryset = queryset.filter(post__isnull=False)
+            # The counters avoid joining posts, so rows need no distinct
+            queryset = queryset.filter(counts__post_count__gt=0)
 
         if self.request.user.is_anonymous:
-            return queryset.order_by('name').distinct()
+            return queryset.order_by('name')
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name')
 
     def perform_create(self, serializer):
         """
@@ -61,31 +264,48 @@ class MainBlogAppViewSet(
         )
 
 
-class TagViewSet(MainBlogAppViewSet):
+class TagViewSet(ResponseCacheMixin, MainBlogAppViewSet):
     """
     Manage tags in the database
     """
     queryset = Tag.objects.all()
+    cache_tags = ('tags', 'posts')
     permission_classes = (AllowAny,)
     http_method_names = ['get', 'head']
     serializer_class = serializers.TagSerializer
 
+    def get_queryset(self):
+        """
+        Annotate tags with their post count
+        """
+        return annotate_post_count(super().get_queryset())
+
+    def get_validator_querysets(self):
+        """
+        Post counts change whenever a post is tagged, which updates the post
+        """
+        return super().get_validator_querysets() + [Post.objects.all()]
+
 
-class ResumeViewSet(viewsets.ModelViewSet):
+class ResumeViewSet(ResponseCacheMixin, ConditionalGetMixin,
+                    viewsets.ModelViewSet):
     """
     Manage resume
     """
     queryset = Resume.objects.all()
+    cache_tags = ('resumes',)
     serializer_class = serializers.ResumeSerializer
     permission_classes = (AllowAny,)
     http_method_names = ['get', 'head']
 
 
-class SkillViewSet(viewsets.ModelViewSet):
+class SkillViewSet(ResponseCacheMixin, ConditionalGetMixin,
+                   viewsets.ModelViewSet):
     """
     Manage skill
     """
     queryset = Skill.objects.all()
+    cache_tags = ('skills',)
     serializer_class = serializers.SkillSerializer
     # authentication_classes = (TokenAuthentication,)
     permission_classes = (AllowAny,)
@@ -101,10 +321,24 @@ class PhotosViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'head']
     serializer_class = serializers.PhotosSerializer
 
+    max_count = 20
+
     def get_queryset(self):
-        pks = Photos.objects.values_list('pk', flat=True).order_by('id')
-        random_photo_id = choice(pks)
-        return Photos.objects.all().filter(id=random_photo_id)
+        """
+        Return randomly picked photos, ?count= sets how many
+        """
+        if self.action != 'list':
+            return self.queryset
+
+        try:
+            count = int(self.request.query_params.get('count', 1))
+        except ValueError:
+            count = 1
+        count = max(1, min(count, self.max_count))
+
+        pks = get_photo_ids(Photos)
+        random_photo_ids = sample(pks, min(count, len(pks)))
+        return self.queryset.filter(id__in=random_photo_ids)
 
 
 class CategoryViewSet(MainBlogAppViewSet):
@@ -115,29 +349,75 @@ class CategoryViewSet(MainBlogAppViewSet):
     serializer_class = serializers.CategorySerializer
 
 
+class TaxonomyViewSet(ResponseCacheMixin, ConditionalGetMixin,
+                      viewsets.GenericViewSet):
+    """
+    List tags and categories with their post and portfolio counts
+    """
+    permission_classes = (AllowAny,)
+    cache_tags = ('tags', 'categories', 'posts')
+    http_method_names = ['get', 'head']
+
+    def get_validator_querysets(self):
+        return [
+            Tag.objects.all(),
+            Category.objects.all(),
+            TaxonomyCount.objects.all(),
+        ]
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            partial(self.conditional_response, self._list), request)
+
+    def _list(self, request):
+        tags = annotate_taxonomy_counts(Tag.objects.order_by('name'))
+        categories = annotate_taxonomy_counts(Category.objects.all())
+        return Response({
+            'tags': serializers.TaxonomyTagSerializer(tags, many=True).data,
+            'categories': serializers.TaxonomyCategorySerializer(
+                categories, many=True).data,
+        })
+
+
 class MessageCreateAPIView(CreateAPIView):
     """Create a new message object"""
     queryset = Message.objects.all()
     serializer_class = serializers.MessageSerializer
 
-    def perform_create(self, serializer):
-        serializer.save(message_id=id_generator(Message))
-
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ResponseCacheMixin, ConditionalGetMixin,
+                  viewsets.ModelViewSet):
     """
     Manage posts in the database
+    Details have their own versioned cache, only lists use the response cache
     """
     queryset = Post.objects.all()
+    cache_tags = ('posts', 'tags', 'categories')
     serializer_class = serializers.PostSerializer
     # authentication_classes = (TokenAuthentication,)
     permission_classes = (AllowAny,)
     pagination_class = StandardResultsSetPagination
     lookup_field = 'slug'
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [PostSearchFilter]
     search_fields = ['title', 'content']
     http_method_names = ['get', 'head']
 
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination when a cursor or ?pagination=cursor is given
+        Searches keep page numbers so results stay in rank order
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            searching = bool(params.get(PostSearchFilter.search_param))
+            keyset = 'cursor' in params or params.get('pagination') == 'cursor'
+            if keyset and not searching:
+                self._paginator = PostCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def _params_to_ints(self, qs):
         """
         Function to convert a list of string IDs to list of integers
@@ -167,25 +447,79 @@ class PostViewSet(viewsets.ModelViewSet):
             except ValueError:
                 queryset = queryset.filter(
                     category__name__icontains=cats.lower())
+
+        if self.action == 'list':
+            queryset = self._list_queryset(queryset)
         return queryset
 
+    def _list_queryset(self, queryset):
+        """
+        Load only the columns the list serializer renders and fetch
+        tags and categories for the whole page in one query each
+        """
+        fields = [
+            field for field in self.get_serializer_class().Meta.fields
+            if field not in ('tags', 'category')
+        ]
+        return queryset.only(*fields).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+            Prefetch('category', queryset=Category.objects.only('id', 'name'))
+        )
+
     def get_serializer_class(self):
         """
         Return appropriate serializer class
         """
         if self.action == 'retrieve':
+            if self.request.query_params.get('content_format') == 'html':
+                return serializers.PostRenderedDetailSerializer
             return serializers.PostDetailSerializer
         elif self.action == 'upload_image':
             return serializers.PostImageSerializer
 
         return self.serializer_class
 
+    def get_validators(self):
+        """
+        Post details are validated by the version of the cached post,
+        falling back to the database when nothing is cached
+        """
+        if self.action != 'retrieve':
+            return super().get_validators()
+
+        slug = self.kwargs['slug']
+        changed = get_cached_post_version(slug)
+        if changed is None:
+            changed = self.queryset.filter(slug=slug).values_list(
+                'cache_version', flat=True).first()
+        if changed is None:
+            return None, None
+        return self.make_etag(changed), changed
+
     def retrieve(self, request, pk=None, slug=None):
-        queryset = Post.objects.all()
-        post = get_object_or_404(queryset, slug=slug)
-        serializer = serializers.PostDetailSerializer(post)
-        caching(slug, serializer.data)
-        return Response(serializer.data)
+        return self.conditional_response(
+            self._retrieve, request, pk=pk, slug=slug)
+
+    def _retrieve(self, request, pk=None, slug=None):
+        """
+        Return post details, served from the cache when available
+        """
+        label = self.queryset.model._meta.model_name
+        if request.query_params.get('content_format') == 'html':
+            label = f'{label}-html'
+        data = get_cached_post(slug, label)
+        if data is None:
+            queryset = self.queryset.model.objects.prefetch_related(
+                Prefetch(
+                    'tags',
+                    queryset=annotate_post_count(Tag.objects.all())
+                ),
+                'category'
+            )
+            post = get_object_or_404(queryset, slug=slug)
+            data = self.get_serializer_class()(post).data
+            cache_post(slug, label, post.cache_version, data)
+        return Response(data)
 
     def perform_create(self, serializer):
         """
@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext as _
 
 from core import models
+from core.utils import save_with_unique_slug
 
 
 class UserAdmin(BaseUserAdmin):
@@ -40,13 +41,19 @@ class PostAdmin(admin.ModelAdmin):
     ordering = ['-date_posted']
     list_display = ['title', 'date_posted', 'author']
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            super().save_model(request, obj, form, change)
+        else:
+            save_with_unique_slug(obj)
+
 
 class PhotosAdmin(admin.ModelAdmin):
     ordering = ['id']
     list_display = ['title', 'user', 'image']
 
 
-class PortfolioAdmin(admin.ModelAdmin):
+class PortfolioAdmin(PostAdmin):
     ordering = ['-date_posted']
     list_display = ['title', 'date_posted', 'author']
 
@@ -71,6 +78,12 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ['name', 'subject', 'date_sent']
 
 
+class JobAdmin(admin.ModelAdmin):
+    ordering = ['-created']
+    list_display = ['name', 'status', 'attempts', 'run_at']
+    list_filter = ['status', 'name']
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Resume, ResumeAdmin)
 admin.site.register(models.Skill, SkillAdmin)
@@ -80,3 +93,4 @@ admin.site.register(models.Category, CategoryAdmin)
 admin.site.register(models.Post, PostAdmin)
 admin.site.register(models.Portfolio, PortfolioAdmin)
 admin.site.register(models.Photos, PhotosAdmin)
+admin.site.register(models.Job, JobAdmin)
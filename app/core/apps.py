@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+        from core.metrics import install_query_timer
+        from core.models import User
+        from core.signals import token_change_handler, user_change_handler
+
+        post_save.connect(token_change_handler, sender=Token)
+        post_delete.connect(token_change_handler, sender=Token)
+        post_save.connect(user_change_handler, sender=User)
+        post_delete.connect(user_change_handler, sender=User)
+        connection_created.connect(install_query_timer)
@@ -0,0 +1,253 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import router
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.metrics import record_cache
+
+
+SIGNED_TOKEN_SALT = 'core.authentication.signed_token'
+
+
+def token_cache_key(key):
+    """
+    Return the shared cache key of a token, hashed so the raw token is
+    never used as a cache key
+    """
+    return f"auth_token_{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def user_generation_cache_key(user_pk):
+    return f"auth_user_generation_{user_pk}"
+
+
+def invalidate_token_cache(user_pk):
+    """
+    Move the user to a new generation so their cached credentials are
+    verified again
+    """
+    key = user_generation_cache_key(user_pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _user_generation(user_pk):
+    key = user_generation_cache_key(user_pk)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the clock so a lost counter never repeats a value
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+class LocalTokenCache:
+    """
+    Small thread safe LRU of verified tokens with a time to live
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the value and the generation it was stored with, if any
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, generation, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value, generation
+
+    def set(self, key, value, generation):
+        with self._lock:
+            self._entries[key] = (
+                value, generation, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_token_cache = LocalTokenCache(
+    settings.AUTH_TOKEN_LOCAL_CACHE_SIZE,
+    settings.AUTH_TOKEN_CACHE_TIMEOUT
+)
+
+
+def _cached_user_fields():
+    return [
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.attname != 'password'
+    ]
+
+
+def credentials_entry(user, token=None, **extra):
+    """
+    Return what the caches keep of a verified user and token
+    Only plain field values are stored, never the password hash
+    """
+    return {
+        'pk': user.pk,
+        'user': tuple(getattr(user, name) for name in _cached_user_fields()),
+        'token': token and (token.key, token.created),
+        **extra,
+    }
+
+
+def credentials_from_entry(entry):
+    """
+    Build a fresh user and token from a cache entry
+    The password is left deferred, so it is only read from the database
+    when needed and saving the user never overwrites it
+    """
+    User = get_user_model()
+    user = User.from_db(
+        router.db_for_read(User), _cached_user_fields(), entry['user'])
+    token = None
+    if entry['token'] is not None:
+        key, created = entry['token']
+        token = Token(key=key, user=user, created=created)
+    return (user, token)
+
+
+def cached_credentials(cache_key, load, user_pk=None):
+    """
+    Return the credentials entry stored under cache_key, calling load to
+    verify them again when neither cache holds them for the current
+    generation of their user. Entries are shared, build instances with
+    credentials_from_entry
+    """
+    stored = local_token_cache.get(cache_key)
+    if stored is not None:
+        entry, generation = stored
+        # The user of a token never changes, even in a stale entry
+        user_pk = entry['pk']
+        if generation == _user_generation(user_pk):
+            record_cache(hits=1)
+            return entry
+
+    stored = cache.get(cache_key)
+    if stored is not None:
+        entry, generation = stored
+        user_pk = entry['pk']
+        if generation == _user_generation(user_pk):
+            local_token_cache.set(cache_key, entry, generation)
+            record_cache(hits=1)
+            return entry
+
+    record_cache(misses=1)
+    # Read before loading so a change made meanwhile is not missed, the
+    # user of a token seen for the first time is only known afterwards
+    generation = None if user_pk is None else _user_generation(user_pk)
+    entry = load()
+    if generation is None:
+        generation = _user_generation(entry['pk'])
+    cache.set(cache_key, (entry, generation),
+              settings.AUTH_TOKEN_CACHE_TIMEOUT)
+    local_token_cache.set(cache_key, entry, generation)
+    return entry
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches verified tokens
+    Users are kept in a per-process LRU in front of the shared cache, both
+    tagged with the generation of the user they were verified in. Deleting
+    a token or saving its user moves that user's generation on, so the
+    change applies to every worker on its next request
+    """
+
+    def authenticate_credentials(self, key):
+        entry = cached_credentials(
+            token_cache_key(key),
+            partial(self.load_credentials, key)
+        )
+        return credentials_from_entry(entry)
+
+    def load_credentials(self, key):
+        return credentials_entry(*super().authenticate_credentials(key))
+
+
+def make_signed_token(user):
+    """
+    Return an expiring signed token for the user
+    The token carries the session hash of the user so changing the
+    password revokes every signed token issued before
+    """
+    return signing.dumps(
+        {'u': user.pk, 'h': user.get_session_auth_hash()},
+        salt=SIGNED_TOKEN_SALT
+    )
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Stateless authentication with tokens from make_signed_token
+
+    Clients should authenticate by passing the token key in the
+    "Authorization" HTTP header, prepended with the string "Bearer ".
+    The signature and expiry are checked without the database and the
+    user comes from the token cache
+    """
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        try:
+            payload = signing.loads(
+                key,
+                salt=SIGNED_TOKEN_SALT,
+                max_age=settings.SIGNED_TOKEN_MAX_AGE
+            )
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        entry = cached_credentials(
+            f"auth_user_{payload['u']}",
+            partial(self.load_user, payload['u']),
+            user_pk=payload['u']
+        )
+        if not constant_time_compare(payload['h'], entry['session_hash']):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        user, _token = credentials_from_entry(entry)
+        return (user, key)
+
+    def load_user(self, pk):
+        try:
+            user = get_user_model().objects.get(pk=pk)
+        except get_user_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return credentials_entry(
+            user, session_hash=user.get_session_auth_hash())
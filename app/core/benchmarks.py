@@ -0,0 +1,367 @@
+import itertools
+import math
+import random
+import string
+import time
+import tracemalloc
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.authentication import CachedTokenAuthentication, \
+    SignedTokenAuthentication, local_token_cache, make_signed_token
+from core.models import Category, Message, Photos, Portfolio, Post, Tag, \
+    TaxonomyCount
+from core.utils import bulk_create_with_unique_slugs, generate_message_id, \
+    invalidate_response_cache, render_post
+
+
+_registry = {}
+
+
+def benchmark(name):
+    """
+    Register a function as a benchmark runnable by the benchmark command
+    Benchmarks receive the command options and return a dict of results
+    """
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_benchmarks():
+    return dict(_registry)
+
+
+def time_calls(func, number):
+    """
+    Call func number times and return the timing in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    elapsed = time.perf_counter() - start
+    return {
+        'calls': number,
+        'total_ms': round(elapsed * 1000, 3),
+        'per_call_us': round(elapsed * 1000000 / number, 3),
+    }
+
+
+def legacy_id_generator(obj, size=10,
+                        chars=string.ascii_uppercase + string.digits):
+    """
+    The random id generator message ids used to come from, which looks
+    the id up in the database before handing it out
+    """
+    the_id = "".join(random.choice(chars) for x in range(size))
+    try:
+        obj.objects.get(message_id=the_id)
+        return legacy_id_generator(obj, size, chars)
+    except obj.DoesNotExist:
+        return the_id
+
+
+@benchmark('message_ids')
+def message_ids_benchmark(options):
+    """
+    Compare the query free message id generator to the legacy one
+    """
+    number = options['number']
+    return {
+        'legacy_id_generator': time_calls(
+            lambda: legacy_id_generator(Message), number),
+        'generate_message_id': time_calls(generate_message_id, number),
+    }
+
+
+def count_queries(func, number):
+    """
+    Call func number times and return the queries made per call
+    """
+    with CaptureQueriesContext(connection) as context:
+        for _ in range(number):
+            func()
+    return round(len(context.captured_queries) / number, 3)
+
+
+@benchmark('token_auth')
+def token_auth_benchmark(options):
+    """
+    Compare token authentication with and without the token cache
+    """
+    number = options['number']
+    user = get_user_model().objects.create_user(
+        email='benchmark@muteshi.co.ke',
+        password='benchmark',
+        name='Benchmark'
+    )
+    token = Token.objects.create(user=user)
+    request = APIRequestFactory().get(
+        '/', HTTP_AUTHORIZATION=f'Token {token.key}')
+    cache.clear()
+    local_token_cache.clear()
+
+    results = {}
+    for name, auth_class in (
+            ('token_authentication', TokenAuthentication),
+            ('cached_token_authentication', CachedTokenAuthentication)):
+        authenticator = auth_class()
+        results[name] = time_calls(
+            lambda: authenticator.authenticate(request), number)
+        results[name]['queries_per_call'] = count_queries(
+            lambda: authenticator.authenticate(request), number)
+    return results
+
+
+@benchmark('login')
+def login_benchmark(options):
+    """
+    Measure account creation, login and authentication with each token
+    Password hashing dominates the first two so they run at most 20 times
+    """
+    from user.views import CreateTokenView, CreateUserAccountView
+
+    number = options['number']
+    hashed = min(number, 20)
+    factory = APIRequestFactory()
+    emails = (f'benchmark{i}@muteshi.co.ke' for i in itertools.count())
+    create_view = CreateUserAccountView.as_view()
+    token_view = CreateTokenView.as_view()
+
+    def legacy_create_account():
+        # The serializer used to hash the password a second time
+        user = get_user_model().objects.create_user(
+            email=next(emails), password='benchmark', name='Benchmark')
+        user.set_password('benchmark')
+        user.save()
+
+    def create_account():
+        create_view(factory.post('/', {
+            'email': next(emails),
+            'password': 'benchmark',
+            'name': 'Benchmark',
+        }))
+
+    user = get_user_model().objects.create_user(
+        email='login@muteshi.co.ke', password='benchmark', name='Benchmark')
+
+    def login():
+        token_view(factory.post(
+            '/?signed=true',
+            {'email': user.email, 'password': 'benchmark'}
+        ))
+
+    token = Token.objects.create(user=user)
+    token_request = factory.get(
+        '/', HTTP_AUTHORIZATION=f'Token {token.key}')
+    signed_request = factory.get(
+        '/', HTTP_AUTHORIZATION=f'Bearer {make_signed_token(user)}')
+    cache.clear()
+    local_token_cache.clear()
+    token_auth = CachedTokenAuthentication()
+    signed_auth = SignedTokenAuthentication()
+
+    return {
+        'legacy_create_account': time_calls(legacy_create_account, hashed),
+        'create_account': time_calls(create_account, hashed),
+        'login': time_calls(login, hashed),
+        'cached_token_authentication': time_calls(
+            lambda: token_auth.authenticate(token_request), number),
+        'signed_token_authentication': time_calls(
+            lambda: signed_auth.authenticate(signed_request), number),
+    }
+
+
+BENCHMARK_CONTENT = """
+## Introduction
+
+Some **bold** words and a [link](https://muteshi.co.ke) in a paragraph
+that is long enough to be worth rendering.
+
+## Details
+
+- First point
+- Second point
+
+```python
+print("hello")
+```
+"""
+
+
+def seed_blog(posts, portfolios=0, tags=20, categories=5, photos=10):
+    """
+    Create an author with posts, portfolios, tags, categories and photos
+    Rows are written in bulk, every post gets three tags and a category
+    """
+    from blog.search import update_search_vectors
+
+    user = get_user_model().objects.create_user(
+        email='seed@muteshi.co.ke', password='benchmark', name='Benchmark')
+    tag_objects = Tag.objects.bulk_create(
+        [Tag(user=user, name=f'Tag {i}') for i in range(tags)])
+    category_objects = Category.objects.bulk_create(
+        [Category(user=user, name=f'Category {i}') for i in range(categories)])
+    if not connection.features.can_return_rows_from_bulk_insert:
+        tag_objects = list(Tag.objects.filter(user=user))
+        category_objects = list(Category.objects.filter(user=user))
+    Photos.objects.bulk_create([
+        Photos(user=user, title=f'Photo {i}', caption='Caption',
+               image=f'uploads/benchmark/photo-{i}.jpg')
+        for i in range(photos)
+    ])
+
+    bulk_create_with_unique_slugs(Post, [render_post(Post(
+        author=user, title=f'Benchmark post {i}',
+        description='A post seeded by the benchmark',
+        content=BENCHMARK_CONTENT,
+    )) for i in range(posts)], batch_size=500)
+    # Multi-table inheritance rules out bulk inserts for portfolios
+    for i in range(portfolios):
+        Portfolio.objects.create(
+            author=user, title=f'Benchmark portfolio {i}',
+            content=BENCHMARK_CONTENT, url='https://muteshi.co.ke')
+
+    post_ids = list(Post.objects.filter(author=user).order_by(
+        'id').values_list('id', flat=True))
+    Post.tags.through.objects.bulk_create([
+        Post.tags.through(
+            post_id=post_id,
+            tag_id=tag_objects[(i + offset) % len(tag_objects)].id)
+        for i, post_id in enumerate(post_ids)
+        for offset in range(min(3, len(tag_objects)))
+    ], batch_size=500)
+    Post.category.through.objects.bulk_create([
+        Post.category.through(
+            post_id=post_id,
+            category_id=category_objects[i % len(category_objects)].id)
+        for i, post_id in enumerate(post_ids)
+    ], batch_size=500)
+    TaxonomyCount.objects.recount()
+    update_search_vectors(Post.objects.filter(author=user))
+    invalidate_response_cache('posts', 'tags', 'categories')
+    return user
+
+
+def percentile(values, percent):
+    """
+    Return the nearest-rank percentile of the values
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def check_response(response):
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f'Benchmark request failed with {response.status_code}')
+
+
+def measure_requests(send, number, cold=False):
+    """
+    Send number requests and return their latency percentiles in
+    milliseconds, the queries per request and the peak memory allocated
+    by a request. A cold run clears the cache before every request
+    """
+    latencies = []
+    for _ in range(number):
+        if cold:
+            cache.clear()
+        start = time.perf_counter()
+        response = send()
+        latencies.append((time.perf_counter() - start) * 1000)
+        check_response(response)
+
+    queries = 0
+    peaks = []
+    # Tracing slows requests down, it gets its own shorter run
+    for _ in range(min(number, 20)):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            tracemalloc.start()
+            try:
+                response = send()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        queries += len(context.captured_queries)
+        check_response(response)
+
+    return {
+        'requests': number,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries_per_request': round(queries / len(peaks), 3),
+        'peak_alloc_kib': round(max(peaks) / 1024, 1),
+    }
+
+
+def api_scenarios(client, slug):
+    """
+    Return the name and request of every API scenario, and whether it
+    reads from the cache
+    """
+    message = {
+        'name': 'Benchmark',
+        'email': 'benchmark@muteshi.co.ke',
+        'subject': 'Benchmark',
+        'comment': 'Sent by the benchmark',
+        'recaptchaToken': 'benchmark',
+    }
+    posts_url = reverse('blog:post-list')
+    return [
+        ('post_list', lambda: client.get(posts_url), True),
+        ('post_retrieve', lambda: client.get(
+            reverse('blog:post-detail', args=[slug])), True),
+        ('post_search', lambda: client.get(
+            posts_url, {'search': 'benchmark'}), True),
+        ('tag_list', lambda: client.get(reverse('blog:tag-list')), True),
+        ('photo_list', lambda: client.get(
+            reverse('blog:photos-list'), {'count': 5}), True),
+        ('message_create', lambda: client.post(
+            reverse('blog:message-create'), message), False),
+    ]
+
+
+@benchmark('api')
+def api_benchmark(options):
+    """
+    Seed the blog and measure its API endpoints through the test client
+    Endpoints reading from the cache are measured cold and warm
+    """
+    number = options['requests']
+    posts = options['posts']
+    seed_blog(posts, portfolios=max(1, posts // 10),
+              tags=max(1, posts // 5), categories=max(1, posts // 20))
+    slug = Post.objects.filter(portfolio__isnull=True).values_list(
+        'slug', flat=True).first()
+    client = APIClient()
+    captcha = mock.Mock()
+    captcha.json.return_value = {'success': True}
+
+    results = {
+        'database': connection.vendor,
+        'posts': posts,
+    }
+    # No request may reach reCAPTCHA from a benchmark
+    with override_settings(ALLOWED_HOSTS=['testserver']), \
+            mock.patch('requests.post',
+                       return_value=captcha):
+        for name, send, cached in api_scenarios(client, slug):
+            results[name] = {'cold': measure_requests(send, number, True)}
+            if cached:
+                results[name]['warm'] = measure_requests(send, number)
+    return results
@@ -0,0 +1,447 @@
+import logging
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+logger = logging.getLogger(__name__)
+
+STATS = (
+    'local_hits', 'local_misses', 'remote_hits', 'remote_misses',
+    'evictions', 'invalidations',
+)
+
+
+class TieredCache(BaseCache):
+    """
+    Per-process LRU in front of a shared cache such as memcached
+
+    LOCATION names the cache alias holding the shared tier. Keys starting
+    with one of the LOCAL_PREFIXES option are also kept in a bounded local
+    LRU for at most LOCAL_TIMEOUT seconds. Keys are spread over BUCKETS
+    generation counters stored in the shared tier; every write bumps the
+    counter of its bucket, and local entries from an older generation are
+    dropped. Workers read the counters at most every POLL_INTERVAL seconds,
+    which bounds how long another worker's write can go unseen locally.
+    Hit and miss counts are added to the shared tier every STATS_INTERVAL
+    seconds for the cache_stats command
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.remote_alias = location
+        self.max_entries = options.get('MAX_ENTRIES', 1000)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self.local_prefixes = tuple(options.get('LOCAL_PREFIXES', ()))
+        self.buckets = options.get('BUCKETS', 64)
+        self.poll_interval = options.get('POLL_INTERVAL', 1)
+        self.stats_interval = options.get('STATS_INTERVAL', 30)
+
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = [0] * self.buckets
+        self._generations_read = None
+        self._stats = dict.fromkeys(STATS, 0)
+        self._stats_flushed = time.monotonic()
+
+    @property
+    def remote(self):
+        return caches[self.remote_alias]
+
+    def generation_key(self, bucket):
+        return f'tiered_generation_{bucket}'
+
+    def stats_key(self, name):
+        return f'tiered_stats_{name}'
+
+    def is_local(self, key):
+        return key.startswith(self.local_prefixes)
+
+    def bucket(self, key):
+        return zlib.crc32(key.encode()) % self.buckets
+
+    def count(self, name, number=1):
+        with self._lock:
+            self._stats[name] += number
+        if time.monotonic() - self._stats_flushed > self.stats_interval:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """
+        Add the hit and miss counts of this process to the shared tier
+        """
+        with self._lock:
+            stats, self._stats = self._stats, dict.fromkeys(STATS, 0)
+            self._stats_flushed = time.monotonic()
+        for name, number in stats.items():
+            if not number:
+                continue
+            key = self.stats_key(name)
+            self.remote.add(key, 0, None)
+            try:
+                self.remote.incr(key, number)
+            except ValueError:
+                self.remote.set(key, number, None)
+
+    def get_stats(self):
+        """
+        Return the hit and miss counts flushed by every process
+        """
+        stats = self.remote.get_many([self.stats_key(name) for name in STATS])
+        return {name: stats.get(self.stats_key(name), 0) for name in STATS}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = dict.fromkeys(STATS, 0)
+        self.remote.delete_many([self.stats_key(name) for name in STATS])
+
+    def refresh_generations(self):
+        now = time.monotonic()
+        if self._generations_read is not None and \
+                now - self._generations_read < self.poll_interval:
+            return
+        keys = [self.generation_key(bucket) for bucket in range(self.buckets)]
+        current = self.remote.get_many(keys)
+        with self._lock:
+            self._generations = [current.get(key, 0) for key in keys]
+            self._generations_read = now
+
+    def bump_generations(self, keys):
+        """
+        Move the buckets of written keys to a new generation
+        """
+        for bucket in {self.bucket(key) for key in keys if self.is_local(key)}:
+            key = self.generation_key(bucket)
+            self.remote.add(key, 0, None)
+            try:
+                generation = self.remote.incr(key)
+            except ValueError:
+                generation = time.time_ns()
+                self.remote.set(key, generation, None)
+            with self._lock:
+                self._generations[bucket] = generation
+
+    def local_get(self, key, version):
+        local_key = self.make_key(key, version)
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return None
+            value, generation, expires = entry
+            if generation != self._generations[self.bucket(key)] or \
+                    expires < time.monotonic():
+                del self._local[local_key]
+                self._stats['invalidations'] += 1
+                return None
+            self._local.move_to_end(local_key)
+        return pickle.loads(value)
+
+    def local_set(self, key, value, timeout, version):
+        timeout = self.timeout_seconds(timeout)
+        if timeout is not None and timeout <= 0:
+            self.local_delete(key, version)
+            return
+        ttl = self.local_timeout if timeout is None \
+            else min(timeout, self.local_timeout)
+        local_key = self.make_key(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (
+                value,
+                self._generations[self.bucket(key)],
+                time.monotonic() + ttl
+            )
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def local_delete(self, key, version):
+        with self._lock:
+            self._local.pop(self.make_key(key, version), None)
+
+    def timeout_seconds(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.remote.default_timeout
+        return timeout
+
+    def get(self, key, default=None, version=None):
+        if not self.is_local(key):
+            value = self.remote.get(key, self._missing_key, version)
+            if value is self._missing_key:
+                return default
+            return value
+
+        self.refresh_generations()
+        value = self.local_get(key, version)
+        if value is not None:
+            self.count('local_hits')
+            return value
+        self.count('local_misses')
+
+        value = self.remote.get(key, self._missing_key, version)
+        if value is self._missing_key:
+            self.count('remote_misses')
+            return default
+        self.count('remote_hits')
+        self.local_set(key, value, None, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        local_keys = [key for key in keys if self.is_local(key)]
+        found = {}
+        if local_keys:
+            self.refresh_generations()
+            for key in local_keys:
+                value = self.local_get(key, version)
+                if value is not None:
+                    found[key] = value
+            self.count('local_hits', len(found))
+            self.count('local_misses', len(local_keys) - len(found))
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.remote.get_many(missing, version)
+            for key, value in fetched.items():
+                if self.is_local(key):
+                    self.local_set(key, value, None, version)
+            remote_hits = sum(1 for key in fetched if self.is_local(key))
+            self.count('remote_hits', remote_hits)
+            self.count('remote_misses', sum(
+                1 for key in missing if self.is_local(key)) - remote_hits)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.remote.set(key, value, timeout, version)
+        if self.is_local(key):
+            self.bump_generations([key])
+            self.local_set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.remote.add(key, value, timeout, version)
+        if added and self.is_local(key):
+            self.bump_generations([key])
+            self.local_set(key, value, timeout, version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.remote.set_many(data, timeout, version)
+        self.bump_generations(data)
+        for key, value in data.items():
+            if self.is_local(key) and key not in failed:
+                self.local_set(key, value, timeout, version)
+        return failed
+
+    def delete(self, key, version=None):
+        deleted = self.remote.delete(key, version)
+        self.forget(key, version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.remote.delete_many(keys, version)
+        self.bump_generations(keys)
+        for key in keys:
+            self.local_delete(key, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.remote.incr(key, delta, version)
+        self.forget(key, version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        value = self.remote.decr(key, delta, version)
+        self.forget(key, version)
+        return value
+
+    def forget(self, key, version):
+        if self.is_local(key):
+            self.bump_generations([key])
+            self.local_delete(key, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self._missing_key, version) \
+            is not self._missing_key
+
+    def clear(self):
+        self.remote.clear()
+        with self._lock:
+            self._local.clear()
+            self._generations = [0] * self.buckets
+            self._generations_read = None
+
+    def close(self, **kwargs):
+        self.remote.close(**kwargs)
+
+
+class ResilientCache(BaseCache):
+    """
+    Circuit breaker in front of a shared cache such as memcached
+
+    LOCATION names the primary cache alias and the FALLBACK option a local
+    one. After FAILURE_THRESHOLD failed calls in a row every call goes to
+    the fallback for RETRY_AFTER seconds, then a single call probes the
+    primary again. Keys written while the circuit was open are deleted
+    from the primary when it comes back, up to MAX_DIRTY_KEYS of them,
+    beyond which the primary is cleared
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.primary_alias = location
+        self.fallback_alias = options.get('FALLBACK', 'fallback')
+        self.failure_threshold = options.get('FAILURE_THRESHOLD', 3)
+        self.retry_after = options.get('RETRY_AFTER', 30)
+        self.max_dirty_keys = options.get('MAX_DIRTY_KEYS', 10000)
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened = None
+        self._dirty = set()
+        self._dirty_overflow = False
+
+    @property
+    def primary(self):
+        return caches[self.primary_alias]
+
+    @property
+    def fallback(self):
+        return caches[self.fallback_alias]
+
+    @property
+    def is_open(self):
+        return self._opened is not None
+
+    def should_probe(self):
+        """
+        Let one call through to the primary once RETRY_AFTER has passed
+        """
+        with self._lock:
+            if time.monotonic() - self._opened < self.retry_after:
+                return False
+            self._opened = time.monotonic()
+            return True
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.failure_threshold:
+                return
+            if self._opened is None:
+                logger.error(
+                    'Cache %s failed %s times, using %s',
+                    self.primary_alias, self._failures, self.fallback_alias)
+            self._opened = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            recovered = self._opened is not None
+            self._failures = 0
+            self._opened = None
+        if recovered:
+            logger.warning('Cache %s is back', self.primary_alias)
+            self.fallback.clear()
+
+    def mark_dirty(self, keys):
+        with self._lock:
+            self._dirty.update(keys)
+            if len(self._dirty) > self.max_dirty_keys:
+                self._dirty = set()
+                self._dirty_overflow = True
+
+    def drop_dirty_keys(self):
+        """
+        Delete from the primary the keys only written to the fallback
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            overflow, self._dirty_overflow = self._dirty_overflow, False
+        try:
+            if overflow:
+                self.primary.clear()
+            elif dirty:
+                self.primary.delete_many(list(dirty))
+        except Exception:
+            with self._lock:
+                self._dirty |= dirty
+                self._dirty_overflow |= overflow
+            raise
+
+    def call(self, method, *args, written=(), **kwargs):
+        if self.is_open and not self.should_probe():
+            self.mark_dirty(written)
+            return getattr(self.fallback, method)(*args, **kwargs)
+        try:
+            if self._dirty or self._dirty_overflow:
+                self.drop_dirty_keys()
+            result = getattr(self.primary, method)(*args, **kwargs)
+        except ValueError:
+            # Raised for missing keys on incr and decr, not an outage
+            raise
+        except Exception:
+            logger.warning('Cache %s failed on %s', self.primary_alias,
+                           method, exc_info=True)
+            self.record_failure()
+            self.mark_dirty(written)
+            return getattr(self.fallback, method)(*args, **kwargs)
+        if self._failures or self.is_open:
+            self.record_success()
+        return result
+
+    def get(self, key, default=None, version=None):
+        return self.call('get', key, default, version)
+
+    def get_many(self, keys, version=None):
+        return self.call('get_many', keys, version)
+
+    def has_key(self, key, version=None):
+        return self.call('has_key', key, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.call('set', key, value, timeout, version, written=[key])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.call('add', key, value, timeout, version, written=[key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.call('set_many', data, timeout, version, written=data)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.call('touch', key, timeout, version, written=[key])
+
+    def delete(self, key, version=None):
+        return self.call('delete', key, version, written=[key])
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        return self.call('delete_many', keys, version, written=keys)
+
+    def incr(self, key, delta=1, version=None):
+        return self.call('incr', key, delta, version, written=[key])
+
+    def decr(self, key, delta=1, version=None):
+        return self.call('decr', key, delta, version, written=[key])
+
+    def clear(self):
+        if self.is_open:
+            with self._lock:
+                self._dirty_overflow = True
+        return self.call('clear')
+
+    def close(self, **kwargs):
+        for cache in (self.primary, self.fallback):
+            try:
+                cache.close(**kwargs)
+            except Exception:
+                logger.warning('Cache close failed', exc_info=True)
@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import time
+from functools import partial
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool as psycopg2_pool
+
+from core.db.backends.postgresql.creation import DatabaseCreation
+
+
+logger = logging.getLogger('core.db')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool(psycopg2_pool.ThreadedConnectionPool):
+    """
+    Thread safe pool opening its connections with the connect callable
+    At most minconn idle connections are kept, the ones over it are closed
+    when put back
+    """
+
+    def __init__(self, minconn, maxconn, connect):
+        self.connect = connect
+        super().__init__(minconn, maxconn)
+
+    def _connect(self, key=None):
+        conn = self.connect()
+        if key is not None:
+            self._used[key] = conn
+            self._rused[id(conn)] = key
+        else:
+            self._pool.append(conn)
+        return conn
+
+    def checkout(self, timeout, interval=0.01):
+        """
+        Return a connection, waiting up to timeout seconds for one to be
+        put back when all of them are in use
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.getconn()
+            except psycopg2_pool.PoolError as error:
+                if self.closed or time.monotonic() >= deadline:
+                    raise base.Database.OperationalError(
+                        f'No database connection free: {error}') from error
+            time.sleep(interval)
+
+
+def close_pools(alias):
+    """
+    Close the connections of every pool of the alias in this process
+    """
+    with _pools_lock:
+        for key in [key for key in _pools if key[1] == alias]:
+            pool = _pools.pop(key)
+            if not pool.closed:
+                pool.closeall()
+
+
+def connection_is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        # Connections fresh from the pool are not in autocommit mode yet
+        if not connection.autocommit:
+            connection.rollback()
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend with connection health checks and an optional pool
+
+    CONN_HEALTH_CHECKS checks a persistent connection before the first
+    query of each request, as Django 4.1 does, and reconnects when the
+    server dropped it. POOL takes MIN_SIZE, MAX_SIZE and TIMEOUT and hands
+    out connections from a per-process pool, closing a connection puts it
+    back. MIN_SIZE defaults to MAX_SIZE, since connections put back over it
+    are closed. Connect and checkout times are logged on core.db
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get(
+            'CONN_HEALTH_CHECKS', False)
+        self.health_check_done = False
+        self.pool_options = self.settings_dict.get('POOL')
+        self.pool = None
+
+    def open_connection(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        logger.info('Connected to database %s in %.1fms', self.alias,
+                    (time.perf_counter() - start) * 1000)
+        return connection
+
+    def get_pool(self, conn_params):
+        # Pools are not shared with forked children and follow the
+        # parameters, which change when tests switch to the test database
+        key = (os.getpid(), self.alias, repr(sorted(conn_params.items())))
+        with _pools_lock:
+            if key not in _pools or _pools[key].closed:
+                max_size = self.pool_options.get('MAX_SIZE', 10)
+                _pools[key] = ConnectionPool(
+                    self.pool_options.get('MIN_SIZE', max_size), max_size,
+                    partial(self.open_connection, conn_params))
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_options:
+            return self.open_connection(conn_params)
+
+        self.pool = self.get_pool(conn_params)
+        start = time.perf_counter()
+        while True:
+            connection = self.pool.checkout(
+                self.pool_options.get('TIMEOUT', 5))
+            if not self.health_check_enabled or \
+                    connection_is_usable(connection):
+                break
+            self.pool.putconn(connection, close=True)
+        logger.debug('Checked out a connection to database %s in %.1fms',
+                     self.alias, (time.perf_counter() - start) * 1000)
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            try:
+                # Closing inside atomic() leaves the connection on the
+                # wrapper, it must not be handed out again
+                self.pool.putconn(
+                    self.connection, close=self.in_atomic_block)
+            except psycopg2_pool.PoolError:
+                # The pool was closed while the connection was out
+                self.connection.close()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Check the connection again before the next request uses it
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or not self.health_check_enabled or \
+                self.health_check_done:
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
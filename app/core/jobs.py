@@ -0,0 +1,118 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+STALE_JOB_TIMEOUT = 60 * 15
+
+_registry = {}
+
+
+def job(name):
+    """
+    Register a function as the handler for jobs with the given name
+    """
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=5, delay=0, **payload):
+    """
+    Queue a job for the worker, payload must be JSON serializable
+    """
+    if name not in _registry:
+        raise ValueError(f'No job handler registered for {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff with jitter for the given number of attempts
+    """
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay + random.uniform(0, delay / 2)
+
+
+def claim_jobs(limit=10):
+    """
+    Lock and mark due jobs as running so no other worker picks them up
+    """
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True).filter(
+                status=Job.PENDING,
+                run_at__lte=timezone.now()
+            ).order_by('run_at')[:limit]
+        )
+        for claimed in jobs:
+            claimed.status = Job.RUNNING
+            claimed.attempts += 1
+            claimed.save(update_fields=['status', 'attempts', 'updated'])
+    return jobs
+
+
+def run_job(claimed):
+    """
+    Run a claimed job, scheduling a retry or dead-lettering it on failure
+    """
+    try:
+        handler = _registry[claimed.name]
+        handler(**claimed.payload)
+    except Exception:
+        claimed.last_error = traceback.format_exc()
+        if claimed.attempts >= claimed.max_attempts:
+            claimed.status = Job.DEAD
+            logger.error('Job %s %s is dead after %s attempts',
+                         claimed.pk, claimed.name, claimed.attempts)
+        else:
+            claimed.status = Job.PENDING
+            claimed.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(claimed.attempts))
+            logger.warning('Job %s %s failed, retrying at %s',
+                           claimed.pk, claimed.name, claimed.run_at)
+    else:
+        claimed.status = Job.DONE
+        claimed.last_error = ''
+
+    claimed.save(update_fields=[
+        'status', 'run_at', 'last_error', 'updated'
+    ])
+    return claimed.status == Job.DONE
+
+
+def requeue_stale_jobs(timeout=STALE_JOB_TIMEOUT):
+    """
+    Return jobs left running by a worker that died back to the queue
+    """
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        updated__lt=cutoff
+    ).update(status=Job.PENDING, run_at=timezone.now())
+
+
+def run_pending_jobs(limit=10):
+    """
+    Run a batch of due jobs and return how many were processed
+    """
+    jobs = claim_jobs(limit)
+    for claimed in jobs:
+        run_job(claimed)
+    return len(jobs)
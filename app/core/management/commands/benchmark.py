@@ -0,0 +1,65 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+
+from core.benchmarks import get_benchmarks
+
+
+class Command(BaseCommand):
+    """Django command to run performance benchmarks"""
+    help = 'Run performance benchmarks and print the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help='Benchmarks to run, all of them when omitted')
+        parser.add_argument(
+            '--number', type=int, default=1000,
+            help='Number of iterations per measurement')
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Number of requests per API measurement')
+        parser.add_argument(
+            '--posts', type=int, default=200,
+            help='Number of posts the API benchmark seeds')
+        parser.add_argument(
+            '--output',
+            help='File to write the results to, standard output by default')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        benchmarks = get_benchmarks()
+        names = options['names'] or sorted(benchmarks)
+        unknown = set(names) - set(benchmarks)
+        if unknown:
+            raise CommandError(
+                f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+
+        # Benchmarks clear the cache and fill it with rows that are rolled
+        # back, give every alias a private local memory cache instead
+        isolated = {
+            alias: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'benchmark-{alias}',
+            }
+            for alias in settings.CACHES
+        }
+        results = {}
+        with override_settings(CACHES=isolated):
+            for name in names:
+                # Benchmarks may write rows, never keep them
+                with transaction.atomic():
+                    results[name] = benchmarks[name](options)
+                    transaction.set_rollback(True)
+
+        report = json.dumps(results, indent=2)
+        if not options['output']:
+            self.stdout.write(report)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.write(report + '\n')
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {", ".join(names)} results to {options["output"]}'))
@@ -0,0 +1,37 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import TieredCache
+
+
+class Command(BaseCommand):
+    """Django command to report the hit rates of the tiered cache"""
+    help = 'Print the local and remote hit and miss counts as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias', default='default',
+            help='Cache alias to report on')
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Reset the counts after printing them')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        cache = caches[options['alias']]
+        if not isinstance(cache, TieredCache):
+            raise CommandError(
+                f'Cache "{options["alias"]}" is not a tiered cache')
+
+        cache.flush_stats()
+        stats = cache.get_stats()
+        for tier in ('local', 'remote'):
+            lookups = stats[f'{tier}_hits'] + stats[f'{tier}_misses']
+            stats[f'{tier}_hit_ratio'] = round(
+                stats[f'{tier}_hits'] / lookups, 4) if lookups else None
+        if options['reset']:
+            cache.reset_stats()
+
+        self.stdout.write(json.dumps(stats, indent=2))
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import percentile
+
+
+async def load_url(client, url, requests, concurrency):
+    """
+    Send requests GETs to the url from concurrency clients at once and
+    return the throughput and latency percentiles
+    """
+    latencies = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'requests_per_second': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+class Command(BaseCommand):
+    """Django command to load test a running server"""
+    help = ('Send concurrent GET requests to a running server and print '
+            'the throughput and latency of every url as JSON. Run it '
+            'against run.sh and run_asgi.sh to compare uWSGI and ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls', nargs='+',
+            help='Urls to load, such as http://localhost/api/blog/posts/')
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Number of requests sent to every url')
+        parser.add_argument(
+            '--concurrency', type=int, default=50,
+            help='Number of requests in flight at once')
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help='Seconds before a request counts as failed')
+        parser.add_argument(
+            '--output',
+            help='File to write the results to, standard output by default')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        results = asyncio.run(self.load(options))
+        report = json.dumps(results, indent=2)
+        if not options['output']:
+            self.stdout.write(report)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.write(report + '\n')
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote the results to {options["output"]}'))
+
+    async def load(self, options):
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(
+                timeout=options['timeout'], limits=limits) as client:
+            return {
+                url: await load_url(
+                    client, url, options['requests'], options['concurrency'])
+                for url in options['urls']
+            }
@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Loads what management commands load
+SETUP_CODE = '''
+import django
+django.setup()
+'''
+# Loads what a worker loads before its first request
+URLS_CODE = '''
+from django.urls import get_resolver
+get_resolver().url_patterns
+'''
+
+
+def parse_importtime(output):
+    """
+    Return the module, self and cumulative microseconds of every line of
+    python -X importtime output
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            # The header line
+            continue
+        modules.append((module.strip(), int(own), int(cumulative)))
+    return modules
+
+
+class Command(BaseCommand):
+    """Django command to profile the imports made at startup"""
+    help = ('Load the app in a fresh interpreter with python -X importtime '
+            'and print the slowest modules and packages as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'modules', nargs='*',
+            help='Modules imported after the app is loaded')
+        parser.add_argument(
+            '--setup-only', action='store_true',
+            help='Only set Django up, as management commands do, '
+                 'without loading the urls and views')
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Number of modules and packages listed')
+        parser.add_argument(
+            '--threshold', type=float,
+            help='Fail when loading takes longer, in milliseconds')
+        parser.add_argument(
+            '--forbid', action='append', default=[],
+            help='Package that must not be imported at startup, repeatable')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        code = SETUP_CODE + ('' if options['setup_only'] else URLS_CODE)
+        code += ''.join(
+            f'import {module}\n' for module in options['modules'])
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, env=os.environ.copy())
+        if result.returncode:
+            raise CommandError(f'Loading the app failed:\n{result.stderr}')
+
+        modules = parse_importtime(result.stderr)
+        packages = defaultdict(int)
+        for module, own, _ in modules:
+            packages[module.split('.')[0]] += own
+        # Nested imports are part of their parent's cumulative time
+        total = sum(own for _, own, _ in modules)
+        limit = options['limit']
+
+        self.stdout.write(json.dumps({
+            'total_ms': round(total / 1000, 1),
+            'modules': [
+                {'module': module, 'self_ms': round(own / 1000, 1),
+                 'cumulative_ms': round(cumulative / 1000, 1)}
+                for module, own, cumulative in sorted(
+                    modules, key=lambda row: row[2], reverse=True)[:limit]
+            ],
+            'packages': [
+                {'package': package, 'ms': round(own / 1000, 1)}
+                for package, own in sorted(
+                    packages.items(), key=lambda row: row[1],
+                    reverse=True)[:limit]
+            ],
+        }, indent=2))
+
+        imported = sorted(set(options['forbid']) & set(packages))
+        if imported:
+            raise CommandError(
+                f'Imported at startup: {", ".join(imported)}')
+        threshold = options['threshold']
+        if threshold is not None and total / 1000 > threshold:
+            raise CommandError(
+                f'Startup imports took {total / 1000:.0f}ms, '
+                f'over {threshold:.0f}ms')
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Post
+from core.utils import bump_post_cache_version, invalidate_response_cache, \
+    render_post
+
+
+class Command(BaseCommand):
+    """Django command to render the markdown of existing posts"""
+    help = 'Store rendered HTML, table of contents and reading time of posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=100,
+            help='Number of posts written per query')
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Only render posts that were never rendered')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        queryset = Post.objects.only('id', 'slug', 'content').order_by('id')
+        if options['missing']:
+            queryset = queryset.filter(rendered_at__isnull=True)
+
+        batch = []
+        rendered = 0
+        for post in queryset.iterator(chunk_size=options['batch']):
+            batch.append(render_post(post))
+            if len(batch) >= options['batch']:
+                rendered += self.save_batch(batch)
+                batch = []
+        if batch:
+            rendered += self.save_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} posts'))
+
+    def save_batch(self, posts):
+        """
+        Write rendered posts and invalidate their caches
+        bulk_update sends no signals, so the cache versions are moved on
+        here
+        """
+        now = timezone.now()
+        for post in posts:
+            post.cache_version = now
+        Post.objects.bulk_update(posts, [
+            'content_html', 'toc', 'word_count', 'reading_time',
+            'rendered_at', 'cache_version'])
+        invalidate_response_cache('posts')
+        for post in posts:
+            bump_post_cache_version(post.slug, now)
+        return len(posts)
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs"""
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the jobs that are due and exit')
+        parser.add_argument(
+            '--batch', type=int, default=10,
+            help='Number of jobs claimed at a time')
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        self.stdout.write('Running background jobs...')
+        requeue_stale_jobs()
+        while True:
+            processed = run_pending_jobs(options['batch'])
+            if processed:
+                self.stdout.write(f'Processed {processed} jobs')
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
@@ -0,0 +1,114 @@
+import resource
+import time
+from contextvars import ContextVar
+
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Counters collected while a single request is handled
+    """
+
+    def __init__(self, record_queries=False, max_queries=200):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.record_queries = record_queries
+        self.max_queries = max_queries
+        self.query_log = []
+
+    def activate(self):
+        return _current_metrics.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_metrics.reset(token)
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+def record_cache(hits=0, misses=0):
+    """
+    Count cache lookups made by the current request, if any
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def query_timer(execute, sql, params, many, context):
+    """
+    Database execute wrapper timing the queries of the current request
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.db_time += duration
+        if metrics.record_queries and \
+                len(metrics.query_log) < metrics.max_queries:
+            metrics.query_log.append((sql, duration))
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    Time the queries of every new connection, whichever thread opens it
+    """
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, query_timer)
+
+
+class TimedSerializerMixin:
+    """
+    Add the time spent in to_representation to the current request
+    Nested and child serializers run inside the outer one are not
+    counted twice
+    """
+
+    def to_representation(self, instance):
+        metrics = _current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return super().to_representation(instance)
+        metrics.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            metrics.serializing = False
+
+
+def memory_usage():
+    """
+    Return the resident and private memory of the process in KiB
+    Private memory is what a forked worker does not share with the master,
+    it is only known on Linux
+    """
+    usage = {'rss_kib': None, 'private_kib': None}
+    try:
+        with open('/proc/self/smaps_rollup', encoding='ascii') as smaps:
+            for line in smaps:
+                name, value = line.split(':', 1)
+                if name == 'Rss':
+                    usage['rss_kib'] = int(value.split()[0])
+                elif name in ('Private_Clean', 'Private_Dirty'):
+                    usage['private_kib'] = (usage['private_kib'] or 0) + \
+                        int(value.split()[0])
+    except (OSError, ValueError):
+        # Peak instead of current memory, in KiB on Linux
+        usage['rss_kib'] = resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss
+    return usage
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.metrics import RequestMetrics
+
+
+logger = logging.getLogger('core.requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure SQL queries, database time, cache lookups and serializer time
+    of every request. Results are sent back in a Server-Timing header when
+    SERVER_TIMING is set and logged as one JSON line per request. Requests
+    to SLOW_REQUEST_VIEWS taking longer than SLOW_REQUEST_THRESHOLD_MS also
+    log the queries they ran
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Lets Django await the middleware instead of running it in
+            # a thread under ASGI
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, metrics, start)
+
+    def start(self):
+        # Queries are timed by core.metrics.query_timer, installed on
+        # every connection when it is opened
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None)
+        metrics = RequestMetrics(record_queries=threshold is not None)
+        return metrics, metrics.activate(), time.perf_counter()
+
+    def finish(self, request, response, metrics, start):
+        duration = (time.perf_counter() - start) * 1000
+        if getattr(settings, 'SERVER_TIMING', False):
+            response['Server-Timing'] = self.server_timing(metrics, duration)
+        self.log(request, response, metrics, duration)
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None)
+        if threshold is not None and duration > threshold and \
+                self.is_watched(request):
+            self.log_slow_request(request, metrics, duration)
+        return response
+
+    def server_timing(self, metrics, duration):
+        return ', '.join([
+            f'db;dur={metrics.db_time * 1000:.2f};'
+            f'desc="{metrics.queries} queries"',
+            f'cache;desc="{metrics.cache_hits} hits, '
+            f'{metrics.cache_misses} misses"',
+            f'serialize;dur={metrics.serializer_time * 1000:.2f}',
+            f'total;dur={duration:.2f}',
+        ])
+
+    def log(self, request, response, metrics, duration):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration, 2),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'serializer_ms': round(metrics.serializer_time * 1000, 2),
+        }))
+
+    def is_watched(self, request):
+        match = getattr(request, 'resolver_match', None)
+        view = getattr(match and match.func, 'cls', None)
+        if view is None:
+            return False
+        watched = tuple(import_string(path) for path in getattr(
+            settings, 'SLOW_REQUEST_VIEWS', ()))
+        return issubclass(view, watched)
+
+    def log_slow_request(self, request, metrics, duration):
+        logger.warning(json.dumps({
+            'slow_request': request.get_full_path(),
+            'duration_ms': round(duration, 2),
+            'queries': [
+                {'sql': sql, 'ms': round(query_time * 1000, 2)}
+                for sql, query_time in metrics.query_log
+            ],
+        }))
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:49
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Add the GIN index and fill the search vector of existing posts
+    Other databases keep using the plain search filter
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX core_post_search_vector_idx '
+        'ON core_post USING gin (search_vector)'
+    )
+    Post = apps.get_model('core', 'Post')
+    Post.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('description', weight='B', config='english') +
+        SearchVector('content', weight='C', config='english')
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_post_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_alter_post_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:52
+
+import core.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='message_id',
+            field=models.CharField(default=core.utils.generate_message_id, max_length=120, unique=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_taxonomy(apps, schema_editor):
+    """
+    Fill the counters from the existing post links
+    """
+    Post = apps.get_model('core', 'Post')
+    TaxonomyCount = apps.get_model('core', 'TaxonomyCount')
+    counts = []
+    for field, through in (('tag', Post.tags.through),
+                           ('category', Post.category.through)):
+        rows = through.objects.order_by().values(f'{field}_id').annotate(
+            posts=models.Count('*'),
+            portfolios=models.Count('post__portfolio')
+        )
+        counts += [TaxonomyCount(**{
+            f'{field}_id': row[f'{field}_id'],
+            'post_count': row['posts'],
+            'portfolio_count': row['portfolios'],
+        }) for row in rows]
+    TaxonomyCount.objects.bulk_create(counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxonomyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.IntegerField(default=0)),
+                ('portfolio_count', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='counts', to='core.category')),
+                ('tag', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='counts', to='core.tag')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='taxonomycount',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('category__isnull', True), ('tag__isnull', False)), models.Q(('category__isnull', False), ('tag__isnull', True)), _connector='OR'), name='core_taxonomycount_one_target'),
+        ),
+        migrations.RunPython(count_taxonomy, migrations.RunPython.noop),
+    ]
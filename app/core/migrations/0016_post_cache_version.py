@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+def copy_updated(apps, schema_editor):
+    """
+    Start the cache version of existing posts at their updated timestamp
+    """
+    Post = apps.get_model('core', 'Post')
+    Post.objects.update(cache_version=models.F('updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_taxonomy_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='cache_version',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_updated, migrations.RunPython.noop),
+    ]
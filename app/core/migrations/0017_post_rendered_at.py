@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+def mark_rendered(apps, schema_editor):
+    """
+    Mark existing posts with stored HTML, or nothing to render, as rendered
+    """
+    Post = apps.get_model('core', 'Post')
+    Post.objects.filter(
+        ~models.Q(content_html='') | models.Q(content='')
+    ).update(rendered_at=models.F('updated'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_post_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='rendered_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(mark_rendered, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,19 @@
 import os
 import uuid
 
-from django.db import models
+from django.db import connections, models, router
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 
 from markdownx.models import MarkdownxField
 
+from core.utils import generate_message_id
+
 
 def post_image_file_path(instance, filename):
     """
@@ -70,6 +74,7 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated = models.DateTimeField(auto_now=True, auto_now_add=False)
 
     def __str__(self):
         return self.name
@@ -84,6 +89,7 @@ class Category(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated = models.DateTimeField(auto_now=True, auto_now_add=False)
 
     class Meta:
         ordering = ["name"]
@@ -104,7 +110,7 @@ class Message(models.Model):
     comment = MarkdownxField()
     date_sent = models.DateTimeField(auto_now=False, auto_now_add=True)
     message_id = models.CharField(
-        max_length=120, default='ABC', unique=True)
+        max_length=120, default=generate_message_id, unique=True)
 
     class Meta:
         ordering = ["-id"]
@@ -123,6 +129,7 @@ class Skill(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated = models.DateTimeField(auto_now=True, auto_now_add=False)
 
     class Meta:
         ordering = ["title"]
@@ -145,6 +152,8 @@ class Photos(models.Model):
         null=True,
         upload_to=post_image_file_path
     )
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name_plural = "Photos"
@@ -167,6 +176,9 @@ class Post(models.Model):
         on_delete=models.CASCADE
     )
     updated = models.DateTimeField(auto_now=True, auto_now_add=False)
+    # Moves on with anything a post renders, tags and categories included,
+    # so caches and validators follow it while updated follows edits
+    cache_version = models.DateTimeField(auto_now=True)
     date_posted = models.DateTimeField(auto_now=False, auto_now_add=True)
     tags = models.ManyToManyField('Tag')
     category = models.ManyToManyField('Category')
@@ -174,10 +186,24 @@ class Post(models.Model):
         null=True,
         upload_to=post_image_file_path
     )
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
+    toc = models.JSONField(default=list, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False)
+    rendered_at = models.DateTimeField(null=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["-date_posted"]
         verbose_name_plural = "Posts"
+        indexes = [
+            models.Index(
+                fields=['-date_posted', '-id'],
+                name='core_post_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -200,6 +226,131 @@ class Resume(models.Model):
 
     title = models.CharField(max_length=120)
     resume = models.FileField(null=True, upload_to=post_image_file_path)
+    updated = models.DateTimeField(auto_now=True, auto_now_add=False)
 
     def __str__(self):
         return self.title
+
+
+class Job(models.Model):
+    """
+    Background job run by the run_jobs worker
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (DEAD, 'Dead'),
+    )
+
+    name = models.CharField(max_length=120)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now=False, auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True, auto_now_add=False)
+
+    class Meta:
+        ordering = ["run_at"]
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='core_job_status_run_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class TaxonomyCountManager(models.Manager):
+
+    def adjust(self, field, deltas):
+        """
+        Add post and portfolio count differences to tags or categories
+        deltas maps tag or category ids to (posts, portfolios) pairs, all of
+        them written in a single upsert creating missing counter rows
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        connection = connections[self._db or router.db_for_write(self.model)]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        column = quote_name(self.model._meta.get_field(field).column)
+        updated = connection.ops.adapt_datetimefield_value(timezone.now())
+        params = []
+        for pk, (posts, portfolios) in deltas.items():
+            params += [pk, posts, portfolios, updated]
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(deltas))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'({column}, post_count, portfolio_count, updated) '
+                f'VALUES {values} ON CONFLICT ({column}) DO UPDATE SET '
+                f'post_count = {table}.post_count + EXCLUDED.post_count, '
+                f'portfolio_count = '
+                f'{table}.portfolio_count + EXCLUDED.portfolio_count, '
+                f'updated = EXCLUDED.updated',
+                params
+            )
+
+    def recount(self):
+        """
+        Rebuild every counter from the post links
+        """
+        counts = []
+        for field, through in (('tag', Post.tags.through),
+                               ('category', Post.category.through)):
+            rows = through.objects.order_by().values(f'{field}_id').annotate(
+                posts=models.Count('*'),
+                portfolios=models.Count('post__portfolio')
+            )
+            counts += [self.model(**{
+                f'{field}_id': row[f'{field}_id'],
+                'post_count': row['posts'],
+                'portfolio_count': row['portfolios'],
+            }) for row in rows]
+        self.all().delete()
+        self.bulk_create(counts)
+        return len(counts)
+
+
+class TaxonomyCount(models.Model):
+    """
+    Number of posts and portfolios using a tag or a category
+    Kept up to date by the blog signals, post_count includes portfolios
+    """
+    tag = models.OneToOneField(
+        Tag, null=True, blank=True,
+        on_delete=models.CASCADE, related_name='counts'
+    )
+    category = models.OneToOneField(
+        Category, null=True, blank=True,
+        on_delete=models.CASCADE, related_name='counts'
+    )
+    post_count = models.IntegerField(default=0)
+    portfolio_count = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True, auto_now_add=False)
+
+    objects = TaxonomyCountManager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(tag__isnull=False, category__isnull=True) |
+                models.Q(tag__isnull=True, category__isnull=False),
+                name='core_taxonomycount_one_target'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.tag or self.category} ({self.post_count})'
@@ -0,0 +1,9 @@
+from core.authentication import invalidate_token_cache
+
+
+def token_change_handler(sender, instance, **kwargs):
+    invalidate_token_cache(instance.user_id)
+
+
+def user_change_handler(sender, instance, **kwargs):
+    invalidate_token_cache(instance.pk)
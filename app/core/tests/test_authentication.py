@@ -0,0 +1,148 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import CachedTokenAuthentication, \
+    local_token_cache, token_cache_key, user_generation_cache_key
+
+
+MANAGE_USER_URL = reverse('user:user-manage')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Test the cached token authentication
+    """
+
+    def setUp(self):
+        cache.clear()
+        local_token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@muteshi.co.ke',
+            password='testpass',
+            name='Test User'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_token_query(self):
+        """
+        Test that a verified token is served from the cache
+        """
+        res = self.client.get(MANAGE_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_shared_cache_used_by_other_workers(self):
+        """
+        Test that an empty local cache falls back to the shared cache
+        """
+        self.client.get(MANAGE_USER_URL)
+        local_token_cache.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_local_hit_reads_only_generation(self):
+        """
+        Test that a token held locally makes a single shared cache read
+        """
+        self.client.get(MANAGE_USER_URL)
+
+        with patch.object(cache, 'get', wraps=cache.get) as get, \
+                patch.object(cache, 'get_many', wraps=cache.get_many) as many:
+            CachedTokenAuthentication().authenticate_credentials(
+                self.token.key)
+
+        get.assert_called_once_with(user_generation_cache_key(self.user.pk))
+        many.assert_not_called()
+
+    def test_other_users_changes_keep_cache(self):
+        """
+        Test that saving another user leaves this user's token cached
+        """
+        self.client.get(MANAGE_USER_URL)
+        other = get_user_model().objects.create_user(
+            email='other@muteshi.co.ke', password='testpass')
+        other.name = 'Other'
+        other.save()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_rejected(self):
+        """
+        Test that a deleted token stops working straight away
+        """
+        self.client.get(MANAGE_USER_URL)
+        self.token.delete()
+
+        res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """
+        Test that deactivating a user invalidates the cached token
+        """
+        self.client.get(MANAGE_USER_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_not_cached(self):
+        """
+        Test that the cached credentials leave out the password hash
+        """
+        self.client.get(MANAGE_USER_URL)
+
+        entry = cache.get(token_cache_key(self.token.key))
+
+        self.assertNotIn(self.user.password, str(entry))
+
+    def test_fresh_user_per_request(self):
+        """
+        Test that each request gets its own user instance
+        """
+        auth = CachedTokenAuthentication()
+        first, _token = auth.authenticate_credentials(self.token.key)
+        second, token = auth.authenticate_credentials(self.token.key)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(first, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_saving_cached_user_keeps_password(self):
+        """
+        Test that saving a user built from the cache keeps its password
+        """
+        self.client.get(MANAGE_USER_URL)
+        user, _token = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key)
+
+        user.name = 'New Name'
+        user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'New Name')
+        self.assertTrue(self.user.check_password('testpass'))
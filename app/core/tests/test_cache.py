@@ -0,0 +1,214 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import ResilientCache, TieredCache
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'LOCAL_PREFIXES': ('hot_',), 'POLL_INTERVAL': 0},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests',
+    },
+    'fallback': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fallback-tests',
+    },
+}
+
+
+def tiered_cache(**options):
+    options.setdefault('LOCAL_PREFIXES', ('hot_',))
+    options.setdefault('POLL_INTERVAL', 0)
+    return TieredCache('shared', {'OPTIONS': options})
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTests(SimpleTestCase):
+    """
+    Test the local LRU in front of the shared cache
+    """
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = tiered_cache()
+
+    def test_hot_key_served_locally(self):
+        """Test that hot keys are read from the shared tier only once"""
+        caches['shared'].set('hot_key', {'a': 1})
+
+        self.assertEqual(self.cache.get('hot_key'), {'a': 1})
+        caches['shared'].set('hot_key', 'changed behind the cache')
+        self.assertEqual(self.cache.get('hot_key'), {'a': 1})
+
+        self.cache.flush_stats()
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['remote_hits'], 1)
+
+    def test_other_keys_not_kept_locally(self):
+        """Test that keys outside the local prefixes always go remote"""
+        self.cache.set('cold_key', 1)
+        caches['shared'].set('cold_key', 2)
+
+        self.assertEqual(self.cache.get('cold_key'), 2)
+
+    def test_write_invalidates_other_workers(self):
+        """Test that a write by one worker reaches the local tier of another"""
+        other = tiered_cache()
+        self.cache.set('hot_key', 'old')
+        self.assertEqual(other.get('hot_key'), 'old')
+
+        self.cache.set('hot_key', 'new')
+        self.assertEqual(other.get('hot_key'), 'new')
+
+        self.cache.delete('hot_key')
+        self.assertIsNone(other.get('hot_key'))
+
+    def test_generations_polled_at_interval(self):
+        """Test that other workers' writes show up after the poll interval"""
+        other = tiered_cache(POLL_INTERVAL=60)
+        self.cache.set('hot_key', 'old')
+        self.assertEqual(other.get('hot_key'), 'old')
+
+        self.cache.set('hot_key', 'new')
+        self.assertEqual(other.get('hot_key'), 'old')
+
+        other._generations_read -= 60
+        self.assertEqual(other.get('hot_key'), 'new')
+
+    def test_local_tier_bounded(self):
+        """Test that the least recently used entries are evicted"""
+        cache = tiered_cache(MAX_ENTRIES=2)
+        for key in ('hot_a', 'hot_b', 'hot_c'):
+            cache.set(key, key)
+
+        self.assertEqual(len(cache._local), 2)
+        self.assertIsNone(cache.local_get('hot_a', None))
+        self.assertEqual(cache.get('hot_a'), 'hot_a')
+
+    def test_local_entries_expire(self):
+        """Test that local entries live at most LOCAL_TIMEOUT seconds"""
+        cache = tiered_cache(LOCAL_TIMEOUT=5)
+        cache.set('hot_key', 'value')
+
+        with patch('core.cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(cache.local_get('hot_key', None))
+
+    def test_local_values_are_copies(self):
+        """Test that mutating a returned value does not change the cache"""
+        self.cache.set('hot_key', {'a': 1})
+        self.cache.get('hot_key')['a'] = 2
+
+        self.assertEqual(self.cache.get('hot_key'), {'a': 1})
+
+    def test_incr_reaches_local_tier(self):
+        """Test that counters stay consistent across tiers"""
+        self.cache.set('hot_count', 1)
+        self.cache.get('hot_count')
+
+        self.assertEqual(self.cache.incr('hot_count'), 2)
+        self.assertEqual(self.cache.get('hot_count'), 2)
+
+    def test_cache_stats_command(self):
+        """Test that the command reports the counts of every tier"""
+        caches['default'].set('hot_key', 1)
+        caches['default'].get('hot_key')
+        caches['default'].get('hot_missing')
+
+        out = StringIO()
+        call_command('cache_stats', '--reset', stdout=out)
+
+        stats = json.loads(out.getvalue())
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['remote_misses'], 1)
+        self.assertEqual(stats['local_hit_ratio'], 0.5)
+        self.assertEqual(caches['default'].get_stats()['local_hits'], 0)
+
+    def test_cache_stats_requires_tiered_cache(self):
+        """Test that the command refuses other cache backends"""
+        with self.assertRaises(CommandError):
+            call_command('cache_stats', '--alias', 'shared')
+
+
+@override_settings(CACHES=CACHES)
+class ResilientCacheTests(SimpleTestCase):
+    """
+    Test the circuit breaker falling back to a local cache
+    """
+
+    def setUp(self):
+        caches['shared'].clear()
+        caches['fallback'].clear()
+        self.cache = ResilientCache('shared', {'OPTIONS': {
+            'FALLBACK': 'fallback',
+            'FAILURE_THRESHOLD': 2,
+            'RETRY_AFTER': 30,
+        }})
+
+    def fail_primary(self):
+        return patch.multiple(
+            caches['shared'],
+            get=lambda *args, **kwargs: self.raise_error(),
+            set=lambda *args, **kwargs: self.raise_error(),
+        )
+
+    def raise_error(self):
+        self.primary_calls += 1
+        raise ConnectionError('memcached is down')
+
+    def test_healthy_primary_used(self):
+        """Test that calls reach the primary while it works"""
+        self.cache.set('key', 'value')
+
+        self.assertEqual(caches['shared'].get('key'), 'value')
+        self.assertIsNone(caches['fallback'].get('key'))
+
+    def test_circuit_opens_after_failures(self):
+        """Test that repeated failures send calls to the fallback"""
+        self.primary_calls = 0
+        with self.fail_primary(), self.assertLogs('core.cache'):
+            self.cache.set('key', 'value')
+            self.assertEqual(self.cache.get('key'), 'value')
+            self.assertTrue(self.cache.is_open)
+
+            for _ in range(5):
+                self.assertEqual(self.cache.get('key'), 'value')
+
+        self.assertEqual(self.primary_calls, 2)
+        self.assertEqual(caches['fallback'].get('key'), 'value')
+
+    def test_circuit_closes_after_probe(self):
+        """Test that the primary is probed again and stale keys dropped"""
+        caches['shared'].set('key', 'stale')
+        self.primary_calls = 0
+        with self.fail_primary(), self.assertLogs('core.cache'):
+            self.cache.set('key', 'first')
+            self.cache.set('key', 'fresh')
+        self.assertTrue(self.cache.is_open)
+
+        # Still open, the primary is not tried
+        self.assertEqual(self.cache.get('key'), 'fresh')
+
+        self.cache._opened -= 30
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.is_open)
+        self.assertIsNone(caches['shared'].get('key'))
+        self.assertIsNone(caches['fallback'].get('key'))
+
+    def test_missing_counter_is_not_a_failure(self):
+        """Test that incr on a missing key raises without opening"""
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+        self.assertEqual(self.cache._failures, 0)
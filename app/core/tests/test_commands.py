@@ -1,9 +1,25 @@
+import asyncio
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
+import httpx
+
+from django.core.cache import cache
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
+from core.benchmarks import measure_requests
+from core.management.commands.load_test import load_url
+from core.management.commands.profile_imports import parse_importtime
+from core.models import Post
+from core.utils import get_cached_post_version
+
 
 class CommandsTestCase(TestCase):
 
@@ -23,3 +39,166 @@ class CommandsTestCase(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_benchmark_message_ids(self):
+        """Test that the message id benchmark reports both generators"""
+        out = StringIO()
+        call_command('benchmark', 'message_ids', '--number', '10', stdout=out)
+
+        results = json.loads(out.getvalue())['message_ids']
+        self.assertEqual(results['generate_message_id']['calls'], 10)
+        self.assertEqual(results['legacy_id_generator']['calls'], 10)
+
+    def test_benchmark_token_auth(self):
+        """Test that cached token authentication makes no queries"""
+        out = StringIO()
+        call_command('benchmark', 'token_auth', '--number', '5', stdout=out)
+
+        results = json.loads(out.getvalue())['token_auth']
+        self.assertGreater(
+            results['token_authentication']['queries_per_call'], 0)
+        self.assertEqual(
+            results['cached_token_authentication']['queries_per_call'], 0)
+
+    def test_benchmark_login(self):
+        """Test that the login benchmark reports every measurement"""
+        out = StringIO()
+        call_command('benchmark', 'login', '--number', '2', stdout=out)
+
+        results = json.loads(out.getvalue())['login']
+        self.assertEqual(results['create_account']['calls'], 2)
+        self.assertEqual(results['signed_token_authentication']['calls'], 2)
+
+    def test_benchmark_api(self):
+        """Test that the API benchmark measures every endpoint"""
+        out = StringIO()
+        call_command('benchmark', 'api', '--requests', '2', '--posts', '10',
+                     stdout=out)
+
+        results = json.loads(out.getvalue())['api']
+        self.assertEqual(results['posts'], 10)
+        for name in ('post_list', 'post_retrieve', 'post_search',
+                     'tag_list', 'photo_list', 'message_create'):
+            self.assertEqual(results[name]['cold']['requests'], 2)
+        self.assertGreater(
+            results['post_list']['cold']['queries_per_request'], 0)
+        self.assertEqual(
+            results['post_list']['warm']['queries_per_request'], 0)
+        self.assertNotIn('warm', results['message_create'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_benchmark_cache_isolated(self):
+        """Test that benchmarks leave the configured cache alone"""
+        cache.set('benchmark_test_key', 'kept')
+        self.addCleanup(cache.delete, 'benchmark_test_key')
+
+        call_command('benchmark', 'token_auth', '--number', '2',
+                     stdout=StringIO())
+
+        self.assertEqual(cache.get('benchmark_test_key'), 'kept')
+
+    def test_benchmark_failed_request(self):
+        """Test that a failed request anywhere in the run is reported"""
+        responses = iter(
+            [httpx.Response(status) for status in (200, 500, 200, 200)])
+
+        with self.assertRaisesMessage(RuntimeError, 'failed with 500'):
+            measure_requests(lambda: next(responses), 4)
+
+    def test_benchmark_output(self):
+        """Test that results can be written to a file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command('benchmark', 'message_ids', '--number', '2',
+                         '--output', path, stdout=StringIO())
+
+            with open(path, encoding='utf-8') as output:
+                results = json.load(output)
+        self.assertIn('message_ids', results)
+
+    def test_load_test(self):
+        """Test that the load test counts requests and errors"""
+        statuses = iter([200, 500] * 5)
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(next(statuses)))
+
+        async def load():
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await load_url(client, 'http://testserver/', 10, 3)
+        results = asyncio.run(load())
+
+        self.assertEqual(results['requests'], 10)
+        self.assertEqual(results['errors'], 5)
+        self.assertGreater(results['requests_per_second'], 0)
+
+    def test_parse_importtime(self):
+        """Test that importtime lines are read with their timings"""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   json.decoder\n'
+            'import time:       300 |        420 | json\n'
+        )
+
+        self.assertEqual(parse_importtime(output), [
+            ('json.decoder', 120, 120),
+            ('json', 300, 420),
+        ])
+
+    def test_profile_imports(self):
+        """Test that app loading leaves the lazy integrations alone"""
+        out = StringIO()
+        call_command('profile_imports', '--setup-only', '--limit', '5',
+                     '--forbid', 'sendgrid', '--forbid', 'bleach',
+                     '--forbid', 'PIL', stdout=out)
+
+        results = json.loads(out.getvalue())
+        self.assertGreater(results['total_ms'], 0)
+        self.assertEqual(len(results['modules']), 5)
+        self.assertEqual(results['packages'][0]['package'], 'django')
+
+    def test_profile_imports_forbidden(self):
+        """Test that a forbidden package imported at startup fails"""
+        with self.assertRaisesRegex(CommandError, 'django'):
+            call_command('profile_imports', '--setup-only',
+                         '--forbid', 'django', stdout=StringIO())
+
+    def test_render_posts(self):
+        """Test that existing posts get their rendered content stored"""
+        user = get_user_model().objects.create_user('test@muteshi.com', 'pw')
+        post = Post.objects.create(
+            author=user, title='Title', content='Some **bold** words')
+        Post.objects.filter(pk=post.pk).update(
+            content_html='', word_count=0, rendered_at=None)
+
+        call_command('render_posts', '--missing', stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(
+            post.content_html, '<p>Some <strong>bold</strong> words</p>')
+        self.assertEqual(post.word_count, 3)
+
+    def test_render_posts_missing_skips_empty_html(self):
+        """Test that posts rendering to no HTML are not rendered again"""
+        user = get_user_model().objects.create_user('test@muteshi.com', 'pw')
+        post = Post.objects.create(author=user, title='Title', content='')
+        self.assertEqual(post.content_html, '')
+
+        out = StringIO()
+        call_command('render_posts', '--missing', stdout=out)
+
+        self.assertIn('Rendered 0 posts', out.getvalue())
+
+    def test_render_posts_invalidates_cache(self):
+        """Test that rendered posts get a new cache version"""
+        user = get_user_model().objects.create_user('test@muteshi.com', 'pw')
+        post = Post.objects.create(
+            author=user, title='Title', content='Some **bold** words')
+
+        call_command('render_posts', stdout=StringIO())
+
+        updated, changed = post.updated, post.cache_version
+        post.refresh_from_db()
+        self.assertEqual(post.updated, updated)
+        self.assertGreater(post.cache_version, changed)
+        self.assertEqual(
+            get_cached_post_version(post.slug), post.cache_version)
@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import Mock
+
+from psycopg2 import OperationalError
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.db.backends.postgresql.base import ConnectionPool, \
+    DatabaseWrapper, close_pools
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """
+    Test checking connections out of the pool
+    """
+
+    def test_checkout_waits_for_free_connection(self):
+        """Test that an exhausted pool fails once the timeout passes"""
+        pool = ConnectionPool(0, 1, Mock)
+        conn = pool.checkout(0.05)
+
+        with self.assertRaises(OperationalError):
+            pool.checkout(0.05)
+        pool.putconn(conn)
+        self.assertIsNotNone(pool.checkout(0.05))
+
+    def test_connections_opened_with_callable(self):
+        """Test that the pool opens its connections with the callable"""
+        connect = Mock()
+        ConnectionPool(2, 3, connect)
+
+        self.assertEqual(connect.call_count, 2)
+
+    def test_pool_keeps_connections_put_back(self):
+        """Test that connections put back are reused up to MAX_SIZE"""
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'POOL': {'MAX_SIZE': 2}},
+            alias='pool_size_tests')
+        wrapper.open_connection = Mock(
+            side_effect=lambda params: Mock(closed=0))
+        self.addCleanup(close_pools, 'pool_size_tests')
+        pool = wrapper.get_pool({})
+
+        checked_out = [pool.getconn(), pool.getconn()]
+        for conn in checked_out:
+            pool.putconn(conn)
+
+        self.assertCountEqual(
+            [pool.getconn(), pool.getconn()], checked_out)
+        self.assertEqual(wrapper.open_connection.call_count, 2)
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql', 'The backend needs Postgres'
+)
+class DatabaseWrapperTests(TransactionTestCase):
+    """
+    Test health checks and pooling against the configured Postgres,
+    run with the default settings and DB_HOST pointing at a server
+    """
+
+    def pooled_wrapper(self):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'CONN_HEALTH_CHECKS': True,
+            'POOL': {'MIN_SIZE': 1, 'MAX_SIZE': 2, 'TIMEOUT': 1},
+        }, alias='pool_tests')
+        self.addCleanup(self.close_pool, wrapper)
+        return wrapper
+
+    def close_pool(self, wrapper):
+        if wrapper.pool is not None and not wrapper.pool.closed:
+            wrapper.pool.closeall()
+
+    def test_health_check_reconnects(self):
+        """Test that a connection dropped between requests is replaced"""
+        connection.health_check_enabled = True
+        self.addCleanup(setattr, connection, 'health_check_enabled',
+                        connection.settings_dict.get('CONN_HEALTH_CHECKS'))
+        connection.ensure_connection()
+        dropped = connection.connection
+        dropped.close()
+
+        connection.close_if_unusable_or_obsolete()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+        self.assertIsNot(connection.connection, dropped)
+
+    def test_pool_reuses_connections(self):
+        """Test that closing puts the connection back for the next use"""
+        wrapper = self.pooled_wrapper()
+        wrapper.ensure_connection()
+        first = wrapper.connection
+        wrapper.close()
+
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, first)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        wrapper.close()
+
+    def test_pool_drops_broken_connections(self):
+        """Test that a checked out connection is checked when enabled"""
+        wrapper = self.pooled_wrapper()
+        wrapper.ensure_connection()
+        broken = wrapper.connection
+        wrapper.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)',
+                           [broken.info.backend_pid])
+
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, broken)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        wrapper.close()
@@ -0,0 +1,118 @@
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job, Message
+
+
+calls = []
+
+
+@jobs.job('test_record')
+def record_job(value):
+    calls.append(value)
+
+
+@jobs.job('test_fail')
+def failing_job():
+    raise RuntimeError('Job failed')
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run_job(self):
+        """Test that a queued job runs once and is marked done"""
+        job = jobs.enqueue('test_record', value=7)
+
+        processed = jobs.run_pending_jobs()
+        job.refresh_from_db()
+
+        self.assertEqual(processed, 1)
+        self.assertEqual(calls, [7])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(jobs.run_pending_jobs(), 0)
+
+    def test_enqueue_unknown_job(self):
+        """Test that queueing a job without a handler fails"""
+        with self.assertRaises(ValueError):
+            jobs.enqueue('test_unknown')
+
+    def test_delayed_job_not_run(self):
+        """Test that a job is not run before it is due"""
+        jobs.enqueue('test_record', delay=60, value=1)
+
+        self.assertEqual(jobs.run_pending_jobs(), 0)
+        self.assertEqual(calls, [])
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test that a failing job is rescheduled with a delay"""
+        job = jobs.enqueue('test_fail', max_attempts=3)
+
+        jobs.run_pending_jobs()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('Job failed', job.last_error)
+
+    def test_failed_job_dead_lettered(self):
+        """Test that a job is dead after its last attempt fails"""
+        job = jobs.enqueue('test_fail', max_attempts=2)
+
+        for _ in range(2):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            jobs.run_pending_jobs()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.DEAD)
+        self.assertEqual(job.attempts, 2)
+
+    def test_stale_running_job_requeued(self):
+        """Test that a job left running by a dead worker is requeued"""
+        job = jobs.enqueue('test_record', value=3)
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING)
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 0)
+        self.assertEqual(jobs.requeue_stale_jobs(timeout=-60), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+
+
+@override_settings(MESSAGE_EMAIL_SENDER='core.utils.send_django_email')
+class MessageEmailJobTests(TestCase):
+
+    def create_message(self):
+        return Message.objects.create(
+            name='Test Name',
+            email='lumteshi@gmail.com',
+            subject='Checking on you',
+            comment='Here is my message',
+        )
+
+    def test_message_email_queued(self):
+        """Test that saving a message queues its email instead of sending"""
+        message = self.create_message()
+
+        job = Job.objects.get(name='send_message_email')
+        self.assertEqual(job.payload, {'message_id': message.pk})
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_run_jobs_command_sends_email(self):
+        """Test that the worker command delivers queued message emails"""
+        message = self.create_message()
+
+        call_command('run_jobs', '--once', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [message.email])
+        self.assertEqual(
+            Job.objects.get(name='send_message_email').status, Job.DONE)
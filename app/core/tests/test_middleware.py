@@ -0,0 +1,139 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+from core.metrics import memory_usage
+from core.models import Post, Skill, Tag
+
+
+POSTS_URL = reverse('blog:post-list')
+SKILLS_URL = reverse('blog:skill-list')
+
+
+def server_timing(response):
+    """Return the Server-Timing header as a dict of metric parameters"""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(SERVER_TIMING=True)
+class RequestMetricsMiddlewareTests(TestCase):
+    """
+    Test the per request metrics middleware
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke', 'testpass')
+        post = Post.objects.create(
+            author=self.user, title='Post', content='Text')
+        post.tags.add(Tag.objects.create(user=self.user, name='Django'))
+        Skill.objects.create(user=self.user, title='HTML', percentage=5)
+
+    def test_server_timing_header(self):
+        """Test that queries and serializer time are reported"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(POSTS_URL)
+
+        metrics = server_timing(res)
+        self.assertEqual(
+            metrics['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(metrics['serialize']['dur']), 0)
+        self.assertIn('total', metrics)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """Test that the header can be turned off"""
+        res = self.client.get(POSTS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_log_line(self):
+        """Test that every request logs one JSON line"""
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            self.client.get(SKILLS_URL)
+
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], SKILLS_URL)
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['queries'], 0)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_request_dumps_queries(self):
+        """Test that slow requests to watched views log their queries"""
+        with self.assertLogs('core.requests', 'WARNING') as logs:
+            self.client.get(POSTS_URL)
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['slow_request'], POSTS_URL)
+        self.assertTrue(line['queries'])
+        self.assertIn('sql', line['queries'][0])
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_request_other_views(self):
+        """Test that views outside SLOW_REQUEST_VIEWS are not dumped"""
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            self.client.get(SKILLS_URL)
+
+        self.assertEqual(
+            [record.levelname for record in logs.records], ['INFO'])
+
+
+@override_settings(SERVER_TIMING=True)
+class CacheMetricsTests(TestCase):
+    """
+    Test the cache lookups counted by the read-through helpers
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            'test@muteshi.co.ke', 'testpass')
+        self.post = Post.objects.create(
+            author=user, title='Post', content='Text')
+
+    def test_hits_and_misses_counted(self):
+        """Test that a cached post detail counts a miss, then a hit"""
+        url = reverse('blog:post-detail', args=[self.post.slug])
+
+        first = self.client.get(url)['Server-Timing']
+        second = self.client.get(url)['Server-Timing']
+
+        self.assertIn('cache;desc="0 hits, 1 misses"', first)
+        self.assertIn('cache;desc="1 hits, 0 misses"', second)
+
+    def test_response_cache_counted(self):
+        """Test that the response cache of lists is counted"""
+        self.client.get(SKILLS_URL)
+
+        res = self.client.get(SKILLS_URL)
+
+        self.assertIn('cache;desc="1 hits, 0 misses"', res['Server-Timing'])
+
+
+class MemoryUsageTests(TestCase):
+    """
+    Test the process memory reported by the WSGI module
+    """
+
+    def test_memory_usage(self):
+        """Test that the resident memory is reported in KiB"""
+        usage = memory_usage()
+
+        self.assertGreater(usage['rss_kib'], 1024)
+        if usage['private_kib'] is not None:
+            self.assertLessEqual(usage['private_kib'], usage['rss_kib'])
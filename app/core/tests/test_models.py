@@ -1,9 +1,12 @@
 from unittest.mock import patch
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
 from core import models
+from core.utils import bulk_create_with_unique_slugs, \
+    generate_message_id, save_with_unique_slug, unique_slugs
 
 email = 'test@muteshi.co.ke'
 password = 'passYangu'
@@ -126,6 +129,29 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(contact), contact.name)
 
+    def test_message_id_generated(self):
+        """
+        Test that messages get a unique id without passing one
+        """
+        message1 = models.Message.objects.create(
+            name='Test Name', email='lumteshi@gmail.com',
+            subject='First', comment='Here is my message')
+        message2 = models.Message.objects.create(
+            name='Test Name', email='lumteshi@gmail.com',
+            subject='Second', comment='Here is my message')
+
+        self.assertEqual(len(message1.message_id), 26)
+        self.assertNotEqual(message1.message_id, message2.message_id)
+
+    def test_message_ids_time_ordered(self):
+        """
+        Test that message ids sort in the order they were generated
+        """
+        ids = [generate_message_id() for _ in range(1000)]
+
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+
     @patch('uuid.uuid4')
     def test_post_file_name_uuid(self, mock_uuid):
         """
@@ -149,3 +175,92 @@ class ModelTests(TestCase):
             author=user, title='Testing title', content='Testing content')
 
         self.assertNotEqual(post1.slug, post2.slug)
+
+    def test_unique_slugs_single_query(self):
+        """
+        Test that slugs for repeated titles are allocated in one query
+        """
+        user = test_user()
+        models.Post.objects.create(
+            author=user, title='Testing title', content='Testing content')
+
+        with self.assertNumQueries(1):
+            slugs = unique_slugs(
+                models.Post, ['Testing title', 'Testing title', 'Other'])
+
+        self.assertEqual(
+            slugs, ['testing-title-2', 'testing-title-3', 'other'])
+
+    def test_portfolio_slug_unique_across_posts(self):
+        """
+        Test that portfolios get a slug that no post uses
+        """
+        user = test_user()
+        post = models.Post.objects.create(
+            author=user, title='Testing title', content='Testing content')
+        portfolio = models.Portfolio.objects.create(
+            author=user, title='Testing title', content='Testing content',
+            url='https://muteshi.com')
+
+        self.assertTrue(portfolio.slug)
+        self.assertNotEqual(post.slug, portfolio.slug)
+
+    def test_save_with_unique_slug_retries(self):
+        """
+        Test that a slug taken by a concurrent save is allocated again
+        """
+        user = test_user()
+        post = models.Post(
+            author=user, title='Testing title', content='Testing content')
+        concurrent = models.Post.objects.create(
+            author=user, title='Other', slug='testing-title', content='x')
+
+        with patch('core.utils.unique_slugs',
+                   side_effect=[['testing-title'], ['testing-title-2']]):
+            save_with_unique_slug(post)
+
+        self.assertEqual(post.slug, 'testing-title-2')
+        self.assertNotEqual(post.pk, concurrent.pk)
+
+    def test_save_with_unique_slug_keeps_given_slug(self):
+        """
+        Test that a slug set by the caller is never replaced
+        """
+        user = test_user()
+        models.Post.objects.create(
+            author=user, title='Other', slug='taken', content='x')
+        post = models.Post(
+            author=user, title='Testing title', slug='taken', content='x')
+
+        with self.assertRaises(IntegrityError):
+            save_with_unique_slug(post)
+
+        self.assertEqual(post.slug, 'taken')
+
+    def test_save_with_unique_slug_other_error(self):
+        """
+        Test that integrity errors unrelated to the slug are not retried
+        """
+        post = models.Post(title='Testing title', content='x')
+
+        with patch('core.utils.unique_slugs', wraps=unique_slugs) as mock, \
+                self.assertRaises(IntegrityError):
+            save_with_unique_slug(post)
+
+        self.assertEqual(mock.call_count, 1)
+
+    def test_bulk_create_with_unique_slugs(self):
+        """
+        Test that bulk created posts get unique slugs
+        """
+        user = test_user()
+        posts = [
+            models.Post(author=user, title='Bulk title', content='content')
+            for _ in range(3)
+        ]
+
+        bulk_create_with_unique_slugs(models.Post, posts)
+
+        slugs = models.Post.objects.values_list('slug', flat=True)
+        self.assertEqual(
+            sorted(slugs), ['bulk-title', 'bulk-title-2', 'bulk-title-3'])
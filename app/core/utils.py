@@ -1,34 +1,147 @@
+import base64
+import io
+import math
 import os
-import string
-import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
 
+from django.conf import settings
 from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
 
-from rest_framework.response import Response
+from core.metrics import record_cache
 
-from python_http_client.exceptions import HTTPError
-from django.template.loader import render_to_string
+# bleach, markdown, PIL and sendgrid are imported where they are used,
+# most processes never render a post, resize an image or send a message
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_message_id_lock = threading.Lock()
+_last_message_id = (0, 0)
 
 
-def id_generator(obj, size=10, chars=string.ascii_uppercase + string.digits):
+def _reset_message_id_state():
     """
-    Util function for generating unique message id
+    Forget the last id in forked workers so they never share a sequence
     """
-    the_id = "".join(random.choice(chars) for x in range(size))
-    try:
-        obj.objects.get(message_id=the_id)
-        id_generator()
-    except obj.DoesNotExist:
-        return the_id
+    global _last_message_id
+    _last_message_id = (0, 0)
+
+
+os.register_at_fork(after_in_child=_reset_message_id_state)
+
+
+def generate_message_id():
+    """
+    Util function for generating a unique, time ordered message id
+    ULID layout: a 48 bit millisecond timestamp followed by 80 random bits,
+    encoded as 26 Crockford base32 characters. Ids from one process are
+    strictly increasing, and the random bits keep ids from other processes
+    and hosts apart without a database lookup
+    """
+    global _last_message_id
+    with _message_id_lock:
+        timestamp = time.time_ns() // 1000000
+        last_timestamp, last_randomness = _last_message_id
+        if timestamp <= last_timestamp:
+            timestamp = last_timestamp
+            randomness = last_randomness + 1
+            if randomness >= 1 << 80:
+                timestamp += 1
+                randomness = int.from_bytes(os.urandom(10), 'big')
+        else:
+            randomness = int.from_bytes(os.urandom(10), 'big')
+        _last_message_id = (timestamp, randomness)
+
+    value = (timestamp << 80) | randomness
+    chars = []
+    for _ in range(26):
+        value, index = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+MARKDOWN_EXTENSIONS = ['extra', 'toc', 'sane_lists']
+# Allowed on top of bleach's default tags
+EXTRA_HTML_TAGS = {
+    'p', 'br', 'hr', 'pre', 'span', 'div', 'img', 'del', 'sup', 'sub',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dl', 'dt', 'dd',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_HTML_ATTRIBUTES = {
+    '*': ['id', 'class'],
+    'a': ['href', 'title', 'rel'],
+    'abbr': ['title'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+    'th': ['align'],
+    'td': ['align'],
+}
+WORDS_PER_MINUTE = 200
+
+
+def _toc_entries(tokens):
+    return [{
+        'level': token['level'],
+        'id': token['id'],
+        'name': token['name'],
+        'children': _toc_entries(token['children']),
+    } for token in tokens]
+
+
+def render_markdown(text):
+    """
+    Util function converting markdown to sanitized HTML
+    Returns the HTML and the table of contents built from its headings
+    """
+    import bleach
+    import markdown
+
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    html = bleach.clean(
+        md.convert(text or ''),
+        tags=set(bleach.sanitizer.ALLOWED_TAGS) | EXTRA_HTML_TAGS,
+        attributes=ALLOWED_HTML_ATTRIBUTES,
+        strip=True,
+    )
+    return html, _toc_entries(md.toc_tokens)
+
+
+def reading_stats(html):
+    """
+    Util function returning the word count and reading time in minutes
+    of rendered HTML
+    """
+    import bleach
+
+    text = bleach.clean(html or '', tags=set(), strip=True)
+    word_count = len(re.findall(r'\w+', text))
+    return word_count, math.ceil(word_count / WORDS_PER_MINUTE)
+
+
+def render_post(post):
+    """
+    Util function filling in the rendered fields of a post from its content
+    """
+    post.content_html, post.toc = render_markdown(post.content)
+    post.word_count, post.reading_time = reading_stats(post.content_html)
+    post.rendered_at = datetime.now(timezone.utc)
+    return post
 
 
 def send_email(obj):
     """
     Util function for sending an email
     """
+    from django.template.loader import render_to_string
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+
     to_email = obj.email
     email_sent_template = "blog/message_send_success.html"
     context = {'msg': obj}
@@ -45,31 +158,331 @@ def send_email(obj):
         subject='Message to Muteshi Paul about ' + obj.subject,
         html_content=message_content)
 
-    try:
-        sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-        return sg.send(message)
+    sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
+    return sg.send(message)
+
+
+def send_django_email(obj):
+    """
+    Util function for sending the message email through Django's
+    email backend, used in place of SendGrid for local runs and tests
+    """
+    from django.template.loader import render_to_string
+
+    message_content = render_to_string(
+        "blog/message_send_success.html", {'msg': obj})
+    return send_mail(
+        subject='Message to Muteshi Paul about ' + obj.subject,
+        message=obj.comment,
+        from_email=os.environ.get('DEFAULT_FROM_EMAIL'),
+        recipient_list=[obj.email],
+        html_message=message_content,
+    )
+
+
+POST_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def post_version_cache_key(slug):
+    """
+    Return the cache key pointing at the current version of a post
+    """
+    return f"post_details_{slug}"
+
+
+def post_detail_cache_key(slug, label, version):
+    """
+    Return the cache key holding a serialized post for a given version
+    """
+    return f"post_details_{slug}:{label}:{version}"
+
 
-    except HTTPError as e:
-        print(e.to_dict)
+def post_cache_version(changed):
+    """
+    Turn a post's cache_version timestamp into a cache version
+    """
+    return int(changed.timestamp() * 1000000)
 
 
-def caching(slug, serializer_data):
+def get_cached_post_version(slug):
     """
-    Util function to implement caching
+    Return the cache_version timestamp of the cached post, if any
+    """
+    version = cache.get(post_version_cache_key(slug))
+    if version is None:
+        return None
+    return datetime.fromtimestamp(version / 1000000, tz=timezone.utc)
+
+
+def get_cached_post(slug, label):
+    """
+    Return the cached serialized post data or None on a cache miss
+    """
+    version = cache.get(post_version_cache_key(slug))
+    data = None
+    if version is not None:
+        data = cache.get(post_detail_cache_key(slug, label, version))
+    record_cache(hits=data is not None, misses=data is None)
+    return data
+
+
+def cache_post(slug, label, changed, serializer_data):
+    """
+    Store serialized post data under the version of the row it was built from
+    Only an absent version pointer is filled in, so a reader racing a save
+    never points the cache back at data older than the saved row
+    """
+    version = post_cache_version(changed)
+    cache.add(post_version_cache_key(slug), version,
+              POST_DETAIL_CACHE_TIMEOUT)
+    cache.set(post_detail_cache_key(slug, label, version),
+              dict(serializer_data), POST_DETAIL_CACHE_TIMEOUT)
+
+
+def bump_post_cache_version(slug, changed):
+    """
+    Point the cache at a newly saved version of a post
+    """
+    cache.set(post_version_cache_key(slug), post_cache_version(changed),
+              POST_DETAIL_CACHE_TIMEOUT)
+
+
+def invalidate_post_cache(slug):
     """
-    cache_key = f"post_details_{slug}"
-    data = cache.get(cache_key)
-    if data:
-        check_cache_validity(data)
-    # if we have updated data or no data set cache
-    cache.set(cache_key, serializer_data)
+    Drop the version pointer so the next read goes to the database
+    """
+    cache.delete(post_version_cache_key(slug))
+
+
+PHOTO_IDS_CACHE_KEY = 'photo_ids'
+
+
+def get_photo_ids(obj):
+    """
+    Return the ids of all photos, cached until a photo is saved or deleted
+    """
+    ids = cache.get(PHOTO_IDS_CACHE_KEY)
+    record_cache(hits=ids is not None, misses=ids is None)
+    if ids is None:
+        ids = list(obj.objects.values_list('pk', flat=True))
+        cache.set(PHOTO_IDS_CACHE_KEY, ids, None)
+    return ids
+
+
+def invalidate_photo_ids():
+    cache.delete(PHOTO_IDS_CACHE_KEY)
+
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+
+
+def response_generation_cache_key(tag):
+    """
+    Return the cache key holding the current generation of a response tag
+    """
+    return f"response_generation_{tag}"
+
+
+def get_response_generations(tags):
+    """
+    Return the current generations of the tags joined in a single string
+    """
+    keys = [response_generation_cache_key(tag) for tag in tags]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # Start from the clock so a lost counter never repeats a value
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def _bump_response_generations(tags):
+    for tag in tags:
+        key = response_generation_cache_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate_response_cache(*tags):
+    """
+    Move the tags to a new generation, orphaning the responses cached
+    under them. The bump is repeated on commit so a response built from
+    rows read before the commit does not outlive it
+    """
+    _bump_response_generations(tags)
+    transaction.on_commit(lambda: _bump_response_generations(tags))
+
+
+def wait_for_cache(key, timeout, interval=0.05):
+    """
+    Poll the cache until the key is filled or the timeout runs out
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def unique_slugs(obj, titles, field='slug'):
+    """
+    Util function allocating a unique slug for each title
+    All taken slugs sharing a prefix with the titles are read in a single
+    indexed query, then repeated titles get an increasing numeric suffix
+    """
+    slug_field = obj._meta.get_field(field)
+    max_length = slug_field.max_length
+    bases = [slugify(title)[:max_length].strip('-') or 'post'
+             for title in titles]
+    if not bases:
+        return []
+
+    prefixes = Q()
+    for base in set(bases):
+        prefixes |= Q(**{f'{field}__startswith': base})
+    # Query the model declaring the field so that slugs of parent and
+    # child models in multi-table inheritance are checked together
+    queryset = slug_field.model._default_manager.filter(prefixes)
+    taken = set(queryset.values_list(field, flat=True))
+
+    slugs = []
+    for base in bases:
+        slug = base
+        if slug in taken:
+            pattern = re.compile(rf'^{re.escape(base)}-(\d+)$')
+            suffixes = [int(match.group(1)) for match in
+                        map(pattern.match, taken) if match]
+            number = max(suffixes, default=1) + 1
+            while True:
+                suffix = f'-{number}'
+                slug = base[:max_length - len(suffix)].strip('-') + suffix
+                if slug not in taken:
+                    break
+                number += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _slugs_taken(obj, slugs, field='slug'):
+    """
+    Return whether another row already holds one of the slugs
+    """
+    slug_field = obj._meta.get_field(field)
+    return slug_field.model._default_manager.filter(
+        **{f'{field}__in': slugs}).exists()
+
+
+def save_with_unique_slug(instance, title_field='title', attempts=3):
+    """
+    Util function saving an instance with a freshly allocated slug
+    A concurrent save claiming the same slug makes the insert fail on the
+    unique constraint, in which case a new slug is allocated and the save
+    retried. Slugs set by the caller and other integrity errors are never
+    retried
+    """
+    model = type(instance)
+    allocate = not instance.slug
+    for attempt in range(attempts):
+        if allocate:
+            instance.slug = unique_slugs(
+                model, [getattr(instance, title_field)])[0]
+        try:
+            with transaction.atomic():
+                instance.save()
+            return instance
+        except IntegrityError:
+            if not allocate or attempt == attempts - 1 or \
+                    not _slugs_taken(model, [instance.slug]):
+                raise
+
+
+def bulk_create_with_unique_slugs(obj, instances, title_field='title',
+                                  batch_size=None, attempts=3):
+    """
+    Util function bulk creating instances with slugs allocated in bulk
+    Slugs are allocated again and the batch retried if a concurrent save
+    took one of them
+    """
+    pending = [instance for instance in instances if not instance.slug]
+    for attempt in range(attempts):
+        slugs = unique_slugs(
+            obj, [getattr(instance, title_field) for instance in pending])
+        for instance, slug in zip(pending, slugs):
+            instance.slug = slug
+        try:
+            with transaction.atomic():
+                return obj.objects.bulk_create(
+                    instances, batch_size=batch_size)
+        except IntegrityError:
+            if not pending or attempt == attempts - 1 or \
+                    not _slugs_taken(obj, slugs):
+                raise
+
+
+IMAGE_VARIANTS_PATH = 'uploads/derivatives/'
+IMAGE_PLACEHOLDER_WIDTH = 16
+
+
+def _webp_bytes(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', quality=quality)
+    return buffer.getvalue()
+
+
+def generate_image_variants(field_file):
+    """
+    Util function saving resized WebP copies of an uploaded image
+    Returns the stored variant names by width and a tiny base64 placeholder,
+    or only the source when the file is not an image so it is not retried
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with field_file.open('rb') as source:
+            image = Image.open(source)
+            image.load()
+    except (UnidentifiedImageError, OSError, ValueError):
+        return {'source': field_file.name}
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(field_file.name))[0]
+    widths = {}
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        # Never upscale, the largest copy keeps the original width
+        width = min(width, image.width)
+        if str(width) in widths:
+            break
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        name = default_storage.save(
+            f'{IMAGE_VARIANTS_PATH}{stem}-{width}.webp',
+            ContentFile(_webp_bytes(resized, quality=80))
+        )
+        widths[str(width)] = name
+
+    placeholder = image.copy()
+    placeholder.thumbnail((IMAGE_PLACEHOLDER_WIDTH, IMAGE_PLACEHOLDER_WIDTH))
+    encoded = base64.b64encode(_webp_bytes(placeholder, quality=30))
+
+    return {
+        'source': field_file.name,
+        'widths': widths,
+        'placeholder': f'data:image/webp;base64,{encoded.decode()}',
+    }
 
 
-def check_cache_validity(data):
+def delete_image_variants(variants):
     """
-    Check if cache data is stale
+    Util function removing the stored files of image variants
     """
-    date_posted = data.get('date_posted')
-    updated_date = data.get('updated')
-    if date_posted == updated_date:
-        return Response(data)
+    for name in (variants or {}).get('widths', {}).values():
+        default_storage.delete(name)
@@ -0,0 +1,19 @@
+"""
+Settings for running the benchmark command against a local SQLite file
+    python manage.py migrate --settings=portfolio_app.benchmark_settings
+    python manage.py benchmark api --settings=portfolio_app.benchmark_settings
+"""
+import os
+
+from portfolio_app.test_settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DB', os.path.join(
+            BASE_DIR, 'benchmark.sqlite3')),  # noqa: F405
+    }
+}
+
+# Report per request metrics in the Server-Timing header
+SERVER_TIMING = True
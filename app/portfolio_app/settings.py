@@ -26,12 +26,55 @@ ALLOWED_HOSTS.extend(
 CACHE_HOST = os.environ.get('CACHE_HOST')
 CACHE_PORT = os.environ.get('CACHE_PORT')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache',
-        'LOCATION': f'{CACHE_HOST}:{CACHE_PORT}',
+if CACHE_HOST:
+    CACHES = {
+        # Hot keys are also kept in a per-process LRU in front of memcached
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(
+                    os.environ.get('LOCAL_CACHE_MAX_ENTRIES', 1000)),
+                'LOCAL_TIMEOUT': int(
+                    os.environ.get('LOCAL_CACHE_TIMEOUT', 30)),
+                'LOCAL_PREFIXES': ('post_details_', 'response_', 'photo_ids'),
+            },
+        },
+        # Falls back to local memory while memcached is unreachable
+        'shared': {
+            'BACKEND': 'core.cache.ResilientCache',
+            'LOCATION': 'memcached',
+            'OPTIONS': {
+                'FALLBACK': 'fallback',
+                'FAILURE_THRESHOLD': 3,
+                'RETRY_AFTER': 30,
+            },
+        },
+        'memcached': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache',
+            'LOCATION': f'{CACHE_HOST}:{CACHE_PORT or 11211}',
+            'OPTIONS': {
+                'binary': True,
+                'behaviors': {
+                    'tcp_nodelay': True,
+                    # Milliseconds to connect, microseconds to send and read
+                    'connect_timeout': 100,
+                    'send_timeout': 100000,
+                    'receive_timeout': 100000,
+                },
+            },
+        },
+        'fallback': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'fallback',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
     }
-}
 
 
 # Application definition
@@ -54,6 +97,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,14 +135,29 @@ WSGI_APPLICATION = 'portfolio_app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
         'HOST': os.environ.get('DB_HOST'),
+        # Keep connections open across requests, checking them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),
     }
 }
 
+# An in-process pool per worker, used with DB_CONN_MAX_AGE=0 so every
+# request hands its connection back. Connections put back while MIN_SIZE
+# are idle get closed, so it defaults to the full size
+if os.environ.get('DB_POOL_MAX_SIZE'):
+    DATABASES['default']['POOL'] = {
+        'MIN_SIZE': int(os.environ.get(
+            'DB_POOL_MIN_SIZE', os.environ['DB_POOL_MAX_SIZE'])),
+        'MAX_SIZE': int(os.environ['DB_POOL_MAX_SIZE']),
+        'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -144,6 +203,9 @@ MEDIA_URL = '/static/media/'
 
 
 MEDIA_ROOT = '/vol/web/media/'
+
+# Widths of the WebP copies generated for uploaded images
+IMAGE_VARIANT_WIDTHS = (320, 640, 1024, 1600)
 STATIC_ROOT = '/vol/web/static/'
 
 # Default primary key field type
@@ -164,6 +226,32 @@ EMAIL_COPY = os.environ.get('EMAIL_COPY')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASSWORD')
 SENDGRID_API_KEY = os.environ.get('SENDGRID_API_ENV_KEY')
 RECAPTCHA_KEY = os.environ.get('RECAPTCHA_KEY')
+RECAPTCHA_TIMEOUT = float(os.environ.get('RECAPTCHA_TIMEOUT', 5))
+
+# Verified API tokens are cached per worker and in the shared cache
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 1000
+
+# Lifetime in seconds of the signed tokens issued by the token endpoint
+SIGNED_TOKEN_MAX_AGE = int(os.environ.get('SIGNED_TOKEN_MAX_AGE', 3600))
+
+# Function delivering the contact form email from the job queue
+MESSAGE_EMAIL_SENDER = os.environ.get(
+    'MESSAGE_EMAIL_SENDER', 'core.utils.send_email')
+
+# Serve the hot blog views and message creation with async views, for
+# running under an ASGI server with scripts/run_asgi.sh
+ASGI_MODE = bool(int(os.environ.get('ASGI_MODE', 0)))
+
+# Per request query, cache and serializer metrics, see core.middleware
+SERVER_TIMING = bool(int(os.environ.get('SERVER_TIMING', 0)))
+SLOW_REQUEST_THRESHOLD_MS = os.environ.get('SLOW_REQUEST_THRESHOLD_MS')
+if SLOW_REQUEST_THRESHOLD_MS is not None:
+    SLOW_REQUEST_THRESHOLD_MS = float(SLOW_REQUEST_THRESHOLD_MS)
+SLOW_REQUEST_VIEWS = (
+    'blog.views.PostViewSet',
+    'blog.views.TagViewSet',
+)
 
 
 LOGGING = {
@@ -199,7 +287,10 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'django.server',
         },
-
+        'stream': {
+            'level': 'DEBUG',
+            'class': 'logging.StreamHandler',
+        },
     },
     'loggers': {
         'django': {
@@ -210,6 +301,21 @@ LOGGING = {
             'handlers': ['django.server'],
             'level': 'INFO',
             'propagate': False,
-        }
+        },
+        'core.requests': {
+            'handlers': ['stream'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'portfolio_app.wsgi': {
+            'handlers': ['stream'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.db': {
+            'handlers': ['stream'],
+            'level': os.environ.get('DB_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     }
 }
@@ -0,0 +1,32 @@
+"""
+Settings for running the test suite without any outside service
+"""
+import os
+import tempfile
+
+from portfolio_app.settings import *  # noqa: F401,F403
+
+SECRET_KEY = 'test-secret-key'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+MEDIA_ROOT = os.path.join(tempfile.gettempdir(), 'portfolio_test_media')
+
+# Hashing at full strength only slows the suite down
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# Keep the per request log lines out of the test output
+LOGGING['loggers']['core.requests']['level'] = 'WARNING'  # noqa: F405
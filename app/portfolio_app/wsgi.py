@@ -7,10 +7,47 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import json
+import logging
 import os
+import time
 
-from django.core.wsgi import get_wsgi_application
+start = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_app.settings')
 
 application = get_wsgi_application()
+
+from django.urls import get_resolver  # noqa: E402
+
+from core.metrics import memory_usage  # noqa: E402
+
+# Import every view now rather than on the first request of each worker,
+# so a preloading master shares them with the workers it forks
+get_resolver().url_patterns
+
+logger = logging.getLogger('portfolio_app.wsgi')
+logger.info(json.dumps({
+    'event': 'application_loaded',
+    'load_ms': round((time.perf_counter() - start) * 1000, 1),
+    **memory_usage(),
+}))
+
+try:
+    import uwsgi
+    from uwsgidecorators import postfork
+except ImportError:
+    pass
+else:
+    @postfork
+    def report_worker_memory():
+        """
+        Log the memory of a worker once forked from the preloaded master
+        """
+        logger.info(json.dumps({
+            'event': 'worker_started',
+            'worker': uwsgi.worker_id(),
+            **memory_usage(),
+        }))
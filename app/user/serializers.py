@@ -29,8 +29,6 @@ class UserAccountSerializer(serializers.ModelSerializer):
             name=validated_data['name'],
             password=validated_data['password'],
         )
-        user.set_password(validated_data['password'])
-        user.save()
         return user
 
     def update(self, instance, validated_data):
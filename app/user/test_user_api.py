@@ -1,10 +1,17 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.core import signing
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.authentication import local_token_cache
+
 
 CREATE_USER_URL = reverse('user:user-create')
 TOKEN_URL = reverse('user:user-token')
@@ -39,6 +46,22 @@ class PublicUserApiTests(TestCase):
         self.assertTrue(user.check_password(payload['password']))
         self.assertNotIn('password', res.data)
 
+    def test_create_user_account_hashes_password_once(self):
+        """
+        Test that creating an account runs the password hasher once
+        """
+        payload = {
+            'email': 'test@muteshi.co.ke',
+            'password': '123pass',
+            'name': 'Testing Jina'
+        }
+        with patch('django.contrib.auth.base_user.make_password',
+                   wraps=make_password) as hasher:
+            res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(hasher.call_count, 1)
+
     def test_account_exists(self):
         """
         Test that existing user account creation will fail
@@ -86,6 +109,23 @@ class PublicUserApiTests(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_create_signed_token_for_user_account(self):
+        """
+        Test that a signed token is issued next to the auth token
+        """
+        payload = {
+            'email': 'test@muteshi.co.ke',
+            'password': '123p',
+            'name': 'Testing Jina'
+        }
+        create_account(**payload)
+        res = self.client.post(f'{TOKEN_URL}?signed=true', payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+        self.assertIn('signed_token', res.data)
+        self.assertIn('expires_in', res.data)
+
     def test_create_token_invalid_credentials(self):
         """
         Test that a token is not created for a user account
@@ -187,3 +227,68 @@ class PrivateAccountApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class SignedTokenApiTests(TestCase):
+    """
+    Test API requests authenticated with signed tokens
+    """
+
+    def setUp(self):
+        cache.clear()
+        local_token_cache.clear()
+        self.payload = {
+            'email': 'test@muteshi.co.ke',
+            'password': 'testpass123',
+        }
+        self.user = create_account(name='Testing Jina', **self.payload)
+        self.client = APIClient()
+        res = self.client.post(f'{TOKEN_URL}?signed=true', self.payload)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {res.data['signed_token']}")
+
+    def test_retrieve_user_with_signed_token(self):
+        """
+        Test that a signed token authenticates without database queries
+        once the user is cached
+        """
+        res = self.client.get(MANAGE_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_signed_token_revoked_by_password_change(self):
+        """
+        Test that changing the password revokes signed tokens
+        """
+        self.client.get(MANAGE_USER_URL)
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(SIGNED_TOKEN_MAX_AGE=-1)
+    def test_expired_signed_token(self):
+        """
+        Test that an expired signed token is rejected
+        """
+        res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tampered_signed_token(self):
+        """
+        Test that a token with a bad signature is rejected
+        """
+        token = signing.dumps({'u': self.user.pk, 'h': 'forged'})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        res = self.client.get(MANAGE_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
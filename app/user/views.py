@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication, \
+    SignedTokenAuthentication, make_signed_token
+
 from .serializers import UserAccountSerializer, AuthTokenSerializer
 
 
@@ -20,6 +26,23 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """
+        Return the auth token, with an expiring signed token next to it
+        when the request asks for ?signed=true
+        """
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+
+        data = {'token': token.key}
+        if request.query_params.get('signed') in ('1', 'true'):
+            data['signed_token'] = make_signed_token(user)
+            data['expires_in'] = settings.SIGNED_TOKEN_MAX_AGE
+        return Response(data)
+
 
 class ManageUserAccountView(generics.RetrieveUpdateAPIView):
     """
@@ -27,7 +50,8 @@ class ManageUserAccountView(generics.RetrieveUpdateAPIView):
     """
     serializer_class = UserAccountSerializer
     queryset = get_user_model().objects.all()
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication, SignedTokenAuthentication)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
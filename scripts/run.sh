@@ -2,10 +2,17 @@
 
 set -e
 
+CPUS=$(nproc)
+export APP_WORKERS=${APP_WORKERS:-$((CPUS * 2))}
+export APP_THREADS=${APP_THREADS:-2}
+export APP_LISTEN=${APP_LISTEN:-128}
+export APP_MAX_REQUESTS=${APP_MAX_REQUESTS:-5000}
+export APP_RELOAD_ON_RSS=${APP_RELOAD_ON_RSS:-256}
+export APP_HARAKIRI=${APP_HARAKIRI:-30}
+export APP_OFFLOAD_THREADS=${APP_OFFLOAD_THREADS:-$CPUS}
 
 python manage.py wait_for_db
 python manage.py collectstatic --noinput
-python manage.py makemigrations core
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module portfolio_app.wsgi
+uwsgi --ini "$(dirname "$0")/uwsgi.ini"
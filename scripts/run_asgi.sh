@@ -0,0 +1,21 @@
+#!/bin/sh
+
+# Alternative to run.sh serving the app with uvicorn in ASGI mode.
+# uvicorn speaks HTTP, so the proxy has to use proxy_pass instead of
+# uwsgi_pass for APP_HOST:APP_PORT.
+
+set -e
+
+export ASGI_MODE=1
+# Views run in pool threads, share a bounded set of connections instead
+# of keeping one open per thread
+export DB_POOL_MAX_SIZE=${DB_POOL_MAX_SIZE:-10}
+export DB_POOL_MIN_SIZE=${DB_POOL_MIN_SIZE:-$DB_POOL_MAX_SIZE}
+export DB_CONN_MAX_AGE=${DB_CONN_MAX_AGE:-0}
+
+python manage.py wait_for_db
+python manage.py collectstatic --noinput
+python manage.py migrate
+
+uvicorn portfolio_app.asgi:application --host 0.0.0.0 --port 9000 \
+    --workers "${ASGI_WORKERS:-4}" --no-access-log